@@ -0,0 +1,279 @@
+# Offline benchmark: GUI-style searches (the first page of cards, with an
+# empty thumbnail cache) against a local mock Reddit (mock_reddit.py), once
+# per fetch engine configuration, plus thumbnailing of a local wallpaper
+# directory. Reports searches/sec, time to first card, time to full page,
+# bytes transferred and peak RSS:
+#
+#   python benchmark.py --engines thread,asyncio --workers 6,16 --image-size 3840x2160 --latency 40
+#
+# Each configuration runs in a fresh process so its peak RSS is its own.
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from wallpaper_core import (DEFAULT_DOWNLOAD_WORKERS, IMAGES_PER_PAGE, HttpClient, ThumbnailCache, ThumbnailTask,
+                            WallpaperSearch, parse_resolution, process_local_image, shutdown_thumbnail_pool)
+from fetch_engines import FETCH_ENGINES, create_fetch_engine
+from mock_reddit import IMAGE_VARIANTS, MockReddit, parse_image_sizes
+from metrics import METRICS
+
+try:
+    import resource
+except ImportError:
+    # Windows: no peak RSS
+    resource = None
+
+def peak_rss_mib(who):
+    # On Linux ru_maxrss starts out at the parent's RSS when forked, which
+    # would charge every configuration for the mock's images, so use this
+    # process' own high-water mark there. For the thumbnail workers it is an
+    # upper bound for the same reason (they start at this process' RSS).
+    if who == 'self' and os.path.exists('/proc/self/status'):
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF if who == 'self' else resource.RUSAGE_CHILDREN).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+def measurements(timings):
+    return {
+        'timings': timings,
+        # Where the time went, by stage (listing fetch, download, render, ...)
+        'metrics': METRICS.snapshot(),
+        'peak_rss_mib': peak_rss_mib('self'),
+        'worker_peak_rss_mib': peak_rss_mib('children')
+    }
+
+def run_searches(config, options, results):
+    # Runs in the child process. Sends ('ready', None) once warmed up, so
+    # the parent can start counting bytes, then ('done', measurements).
+    http = HttpClient(config['workers'] + 4)
+    engine = create_fetch_engine(config['engine'], http, config['workers'])
+    work_dir = tempfile.mkdtemp(prefix='wallpaper-bench-')
+    timings = []
+    try:
+        for run in range(options['warmup'] + options['searches']):
+            if run == options['warmup']:
+                METRICS.reset()
+                results.put(('ready', None))
+            # A new cache directory each time: every thumbnail is rendered
+            thumbnail_cache = ThumbnailCache(os.path.join(work_dir, str(run)))
+            task = ThumbnailTask(thumbnail_cache, options['thumbnails'])
+            search = WallpaperSearch(engine, options['subreddits'], options['resolution'],
+                                     base_url=options['base_url'])
+            card_times = []
+            started = time.perf_counter()
+            while len(card_times) < IMAGES_PER_PAGE and search.has_more():
+                search.fetch_page(task, lambda *result: card_times.append(time.perf_counter() - started),
+                                  max_results=IMAGES_PER_PAGE - len(card_times))
+            # The last card, fetch_page may still be waiting for a slow listing
+            full_page = card_times[-1] if card_times else time.perf_counter() - started
+            # Downloads still running past the full page belong to this run
+            engine.drain()
+            if run >= options['warmup']:
+                timings.append({
+                    'total': time.perf_counter() - started,
+                    'full_page': full_page,
+                    'first_card': card_times[0] if card_times else None,
+                    'cards': len(card_times)
+                })
+    finally:
+        engine.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    shutdown_thumbnail_pool()
+    results.put(('done', measurements(timings)))
+
+def run_local(config, options, results):
+    # Thumbnails for a directory of wallpapers, as the My Wallpapers tab
+    # does on a cold cache (the files are written by the parent)
+    work_dir = tempfile.mkdtemp(prefix='wallpaper-bench-')
+    timings = []
+    try:
+        paths = sorted(os.path.join(options['local_dir'], name) for name in os.listdir(options['local_dir']))
+        for run in range(options['warmup'] + options['searches']):
+            if run == options['warmup']:
+                METRICS.reset()
+                results.put(('ready', None))
+            thumbnail_cache = ThumbnailCache(os.path.join(work_dir, str(run)))
+            started = time.perf_counter()
+            first_card = None
+            with ThreadPoolExecutor(max_workers=config['workers']) as executor:
+                for future in as_completed([executor.submit(process_local_image, thumbnail_cache, path)
+                                            for path in paths]):
+                    if future.result() and first_card is None:
+                        first_card = time.perf_counter() - started
+            if run >= options['warmup']:
+                total = time.perf_counter() - started
+                timings.append({'total': total, 'full_page': total, 'first_card': first_card, 'cards': len(paths)})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    shutdown_thumbnail_pool()
+    results.put(('done', measurements(timings)))
+
+def run_config(config, options, mock):
+    # One configuration in a child process; returns its report row
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    target = run_local if config['engine'] == 'local' else run_searches
+    process = context.Process(target=target, args=(config, options, results))
+    process.start()
+    before = None
+    measured = None
+    while measured is None:
+        try:
+            kind, payload = results.get(timeout=1)
+        except queue.Empty:
+            if not process.is_alive():
+                raise RuntimeError(f"{config['engine']} benchmark process died (exit code {process.exitcode})")
+            continue
+        if kind == 'ready':
+            before = mock.snapshot()
+        else:
+            measured = payload
+    after = mock.snapshot()
+    process.join()
+
+    timings = measured['timings']
+    total = sum(timing['total'] for timing in timings)
+    first_cards = [timing['first_card'] for timing in timings if timing['first_card'] is not None]
+    return {
+        'engine': config['engine'],
+        'workers': config['workers'],
+        'searches': len(timings),
+        'searches_per_sec': len(timings) / total if total else None,
+        'first_card_ms': statistics.median(first_cards) * 1000 if first_cards else None,
+        'full_page_ms': statistics.median(timing['full_page'] for timing in timings) * 1000 if timings else None,
+        'cards': min((timing['cards'] for timing in timings), default=0),
+        'bytes_per_search': (after['bytes'] - before['bytes']) / len(timings) if timings else 0,
+        'requests_per_search': (after['listings'] + after['images'] - before['listings'] - before['images'])
+                               / len(timings) if timings else 0,
+        'peak_rss_mib': measured['peak_rss_mib'],
+        'worker_peak_rss_mib': measured['worker_peak_rss_mib'],
+        'metrics': measured['metrics']
+    }
+
+def write_local_files(mock, directory, count):
+    os.makedirs(directory, exist_ok=True)
+    extension = 'png' if mock.image_format == 'png' else 'jpg'
+    for number in range(count):
+        width, height = mock.image_sizes[number % len(mock.image_sizes)]
+        with open(os.path.join(directory, f'wallpaper_{number}.{extension}'), 'wb') as f:
+            f.write(mock.image(width, height, mock.image_format, number % IMAGE_VARIANTS))
+
+def format_row(row):
+    def value(key, pattern):
+        return pattern.format(row[key]) if row[key] is not None else '-'
+    return (f"{row['engine']:<8} {row['workers']:>7} {value('searches_per_sec', '{:.2f}'):>10} "
+            f"{value('first_card_ms', '{:.0f}'):>14} {value('full_page_ms', '{:.0f}'):>13} "
+            f"{row['cards']:>5} {row['bytes_per_search'] / (1024 * 1024):>13.2f} "
+            f"{row['requests_per_search']:>8.1f} {value('peak_rss_mib', '{:.0f}'):>9} "
+            f"{value('worker_peak_rss_mib', '{:.0f}'):>11}")
+
+def benchmark(configs, options, mock_options, local_files=0, out=sys.stdout):
+    rows = []
+    with MockReddit(**mock_options) as mock:
+        options = dict(options, base_url=mock.url)
+        local_dir = None
+        if local_files:
+            local_dir = tempfile.mkdtemp(prefix='wallpaper-bench-local-')
+            write_local_files(mock, local_dir, local_files)
+            configs = configs + [{'engine': 'local', 'workers': configs[0]['workers'] if configs else
+                                  DEFAULT_DOWNLOAD_WORKERS}]
+        options['local_dir'] = local_dir
+        # Generate the images up front, not during the first timed search
+        mock.prepare()
+
+        print(f"{'engine':<8} {'workers':>7} {'searches/s':>10} {'first card ms':>14} {'full page ms':>13} "
+              f"{'cards':>5} {'MiB/search':>13} {'requests':>8} {'RSS MiB':>9} {'workers MiB':>11}", file=out)
+        try:
+            for config in configs:
+                row = run_config(config, options, mock)
+                rows.append(row)
+                print(format_row(row), file=out, flush=True)
+        finally:
+            if local_dir:
+                shutil.rmtree(local_dir, ignore_errors=True)
+    return rows
+
+def parse_list(text, convert=str):
+    return [convert(item.strip()) for item in text.split(',') if item.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark searches against a local mock Reddit.")
+    parser.add_argument('--engines', default=','.join(FETCH_ENGINES),
+                        help=f"comma-separated fetch engines (default: {','.join(FETCH_ENGINES)})")
+    parser.add_argument('--workers', default=str(DEFAULT_DOWNLOAD_WORKERS),
+                        help=f"comma-separated parallel download counts, threads or asyncio concurrency "
+                             f"(default: {DEFAULT_DOWNLOAD_WORKERS})")
+    parser.add_argument('--searches', type=int, default=5, help="timed searches per configuration (default: 5)")
+    parser.add_argument('--warmup', type=int, default=1, help="untimed searches first (default: 1)")
+    parser.add_argument('--subreddits', default='wallpapers,wallpaper,widescreenwallpaper',
+                        help="comma-separated subreddit names to search")
+    parser.add_argument('-r', '--resolution', help="resolution filter of the searches (default: none)")
+    parser.add_argument('--thumbnails', choices=('preview', 'original'), default='preview',
+                        help="render cards from preview renditions or originals (default: preview)")
+    parser.add_argument('--image-size', default='1920x1080,3840x2160,2560x1440,1080x1920',
+                        help="comma-separated sizes of the generated images, used in turn")
+    parser.add_argument('--format', choices=('jpeg', 'png'), default='jpeg', help="image format (default: jpeg)")
+    parser.add_argument('--latency', type=float, default=20, help="milliseconds before each image (default: 20)")
+    parser.add_argument('--listing-latency', type=float, default=100,
+                        help="milliseconds before each listing (default: 100)")
+    parser.add_argument('--listing-jitter', type=float, default=0,
+                        help="up to this many milliseconds more per listing, at random (default: 0)")
+    parser.add_argument('--bandwidth', type=float, help="KiB/s per response (default: unlimited)")
+    parser.add_argument('--no-previews', action='store_true', help="leave sizes and previews out of listings")
+    parser.add_argument('--local-files', type=int, default=36,
+                        help="wallpapers in the local directory benchmark, 0 to skip (default: 36)")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        image_sizes = parse_image_sizes(args.image_size)
+        parse_resolution(args.resolution)
+        engines = parse_list(args.engines)
+        workers = parse_list(args.workers, int)
+    except ValueError as e:
+        parser.error(str(e))
+    unknown = [engine for engine in engines if engine not in FETCH_ENGINES]
+    if unknown or not engines:
+        parser.error(f"unknown engines: {', '.join(unknown)}")
+    if not workers or min(workers) < 1 or args.searches < 1 or args.warmup < 0:
+        parser.error("--workers and --searches must be at least 1")
+
+    configs = [{'engine': engine, 'workers': count} for engine in engines for count in workers]
+    options = {
+        'searches': args.searches,
+        'warmup': args.warmup,
+        'subreddits': parse_list(args.subreddits),
+        'resolution': args.resolution,
+        'thumbnails': args.thumbnails
+    }
+    mock_options = {
+        'image_sizes': image_sizes,
+        'image_format': args.format,
+        'latency': args.latency / 1000,
+        'listing_latency': args.listing_latency / 1000,
+        'listing_jitter': args.listing_jitter / 1000,
+        'bandwidth': args.bandwidth * 1024 if args.bandwidth else None,
+        'previews': not args.no_previews
+    }
+    rows = benchmark(configs, options, mock_options, args.local_files)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'options': dict(options, **mock_options), 'results': rows}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,458 @@
+# Fetch engines run a WallpaperSearch page: the listing requests, the image
+# downloads and the per-image work of an ImageTask. Both engines deliver the
+# same results in the same order, so they can be swapped (and benchmarked)
+# freely.
+#
+#   thread   - a bounded ThreadPoolExecutor around the shared HttpClient
+#   asyncio  - one event loop running every request concurrently through
+#              aiohttp, bounded by a global semaphore and a per-host limit
+import asyncio
+import json
+import os
+from concurrent.futures import CancelledError, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from threading import Thread
+from urllib.parse import urlsplit
+
+# Optional and slow to import, so only loaded once an asyncio engine is created
+aiohttp = None
+
+from wallpaper_core import (DEFAULT_DOWNLOAD_WORKERS, REQUEST_TIMEOUT, USER_AGENT, PROBE_CHUNK_SIZE,
+                            HeaderProbe, HttpClient, ImageRejected, ImageTask, ListingCache, fetch_listing,
+                            listing_url, parse_listing)
+from metrics import METRICS
+
+FETCH_ENGINES = ('thread', 'asyncio')
+ASYNC_CONCURRENCY = 64
+ASYNC_PER_HOST_LIMIT = 16
+ASYNC_RETRIES = 3
+
+class ThreadFetchEngine:
+    name = 'thread'
+
+    def __init__(self, http, workers=DEFAULT_DOWNLOAD_WORKERS):
+        self.http = http
+        self.workers = workers
+        # Tasks a full page left running, see drain()
+        self.in_flight = set()
+        # ... and by URL, for the next page of the same search to pick up
+        # instead of downloading them again: (search, resolution, {url: future})
+        self.carried = (None, None, {})
+        # Listings still on their way when a page filled up, for the next
+        # page of the same search: (search, {future: subreddit})
+        self.late_listings = (None, {})
+
+    def run_page(self, search, task, on_result, cancel_event, max_results):
+        # Listings are fetched in parallel once the queue can't fill the page
+        # (see needs_listings()), and each one's posts start downloading as
+        # soon as it arrives, not once the slowest is in
+        listing_executor = ThreadPoolExecutor(max_workers=max(len(search.subreddit_names), 1))
+        late_search, listings = self.late_listings
+        self.late_listings = (None, {})
+        if late_search is not search:
+            listings = {}
+
+        def request_listings():
+            fetching = set(listings.values())
+            for name in search.listings_due():
+                if name in fetching:
+                    continue
+                future = listing_executor.submit(fetch_listing, self.http, name, search.after_ids.get(name),
+                                                 search.limit, search.listing_cache, search.base_url)
+                listings[future] = name
+
+        try:
+            return self.process_candidates(search, listings, request_listings, task, on_result, cancel_event,
+                                           max_results)
+        finally:
+            # A listing still on its way when the page filled up is handed to
+            # the next page rather than waited for, so the page returns now
+            if listings and not cancel_event.is_set():
+                self.late_listings = (search, listings)
+                self.in_flight |= set(listings)
+            listing_executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _listing_result(future):
+        try:
+            return future.result()
+        except Exception as e:
+            return e
+
+    def _process(self, task, post_data, header_check, cancel_event):
+        try:
+            return task.run(self.http, post_data, header_check)
+        except Exception as e:
+            # Failures after a cancel (e.g. on shutdown) are of no interest
+            if not cancel_event.is_set():
+                print(f"Error processing image: {e}")
+            return None
+
+    def process_candidates(self, search, listings, request_listings, task, on_result, cancel_event, max_results):
+        # Run the task on a bounded pool, but hand results over in the order
+        # the candidates were taken so positions don't depend on network
+        # timing. listings maps the futures of listings still being fetched
+        # to their subreddit; they are queued as they complete (and removed
+        # from listings). request_listings() adds the due ones, called at
+        # most once.
+        workers = self.workers
+        executor = ThreadPoolExecutor(max_workers=workers)
+        carried_search, carried_resolution, carried = self.carried
+        if carried_search is not search or carried_resolution != search.desired_resolution:
+            carried = {}
+        self.carried = (None, None, {})
+        futures = []
+        pending = {}
+        results = {}
+        candidates = []
+        next_index = 0
+        found = 0
+        requested = False
+
+        try:
+            while max_results is None or found < max_results:
+                if cancel_event.is_set():
+                    return found
+
+                for future in [future for future in listings if future.done()]:
+                    search.add_listing(listings.pop(future), self._listing_result(future))
+                if not requested and needs_listings(search, max_results, found, len(candidates) - next_index):
+                    request_listings()
+                    requested = True
+
+                # Keep the pool busy, but never run too far ahead of the next
+                # result or start more than the page still needs
+                while len(candidates) - next_index < look_ahead(workers * 2, max_results, found):
+                    post_data = search.next_candidate()
+                    if post_data is None:
+                        break
+                    future = carried.pop(post_data['url'], None)
+                    if future is None:
+                        future = executor.submit(self._process, task, post_data, search.header_check(post_data),
+                                                 cancel_event)
+                    pending[future] = len(candidates)
+                    futures.append(future)
+                    candidates.append(post_data)
+
+                if next_index == len(candidates):
+                    # Nothing queued: wait for a listing, unless none is coming
+                    if not listings:
+                        break
+                    wait(listings, return_when=FIRST_COMPLETED)
+                    continue
+
+                if next_index not in results:
+                    done, _ = wait(list(pending) + list(listings), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future in pending:
+                            results[pending.pop(future)] = future.result()
+                    continue
+
+                # Before the result is taken, so a cancelled page requeues it
+                if cancel_event.is_set():
+                    return found
+                post_data = candidates[next_index]
+                result = results.pop(next_index)
+                next_index += 1
+
+                if not search.accept(post_data, result):
+                    continue
+                on_result(post_data, result, found)
+                found += 1
+
+            return found
+        finally:
+            # Drop whatever is still queued once the page is full. Whatever the
+            # page took but didn't need is kept for the next one; downloads
+            # that had already started carry on and are handed over with it.
+            unused = carried
+            for future, post_data in zip(futures[next_index:], candidates[next_index:]):
+                if not future.cancel():
+                    unused[post_data['url']] = future
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.in_flight = {future for future in self.in_flight | set(pending) if not future.done()}
+            if not cancel_event.is_set():
+                self.carried = (search, search.desired_resolution, unused)
+            search.requeue(candidates[next_index:])
+
+    def drain(self):
+        # Wait for the downloads (and listings) that were already running
+        # when a page filled up; they finish in the background otherwise (and
+        # still fill the thumbnail cache). Used by the benchmark between runs.
+        wait(self.in_flight)
+        self.in_flight = set()
+
+    def close(self):
+        pass
+
+class AsyncioFetchEngine:
+    # The event loop lives on its own thread; run_page blocks the calling
+    # (worker) thread until the page is done, and on_result is called from the
+    # loop thread, which is fine for Qt's queued signals. CPU work (decoding,
+    # thumbnails, header probes), disk cache lookups and the search's index
+    # reads and writes (add_listing, accept, header checks) run on an
+    # executor so the loop never stalls.
+    name = 'asyncio'
+
+    def __init__(self, http, concurrency=ASYNC_CONCURRENCY, per_host=ASYNC_PER_HOST_LIMIT, cpu_workers=None):
+        global aiohttp
+        try:
+            import aiohttp
+        except ImportError:
+            raise RuntimeError("The asyncio fetch engine needs aiohttp (pip install aiohttp)")
+        # Shares the User-Agent and Reddit rate-limit state with the thread engine
+        self.http = http
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.executor = ThreadPoolExecutor(max_workers=cpu_workers or os.cpu_count() or 4)
+        # CPU work of cancelled candidates carries on in the executor, see drain()
+        self.in_flight = set()
+        # As in ThreadFetchEngine, listing tasks a full page left running
+        self.late_listings = (None, {})
+        self.session = None
+        self.semaphore = None
+        self.closed = False
+        self.loop = asyncio.new_event_loop()
+        Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def run_page(self, search, task, on_result, cancel_event, max_results):
+        # The loop no longer runs once closed, nothing would ever answer
+        if self.closed:
+            raise RuntimeError("The fetch engine has been closed")
+        future = asyncio.run_coroutine_threadsafe(
+            self._run_page(search, task, on_result, cancel_event, max_results), self.loop
+        )
+        try:
+            return future.result()
+        except CancelledError:
+            raise RuntimeError("The fetch engine was closed during the page")
+
+    def drain(self):
+        # As ThreadFetchEngine.drain(). The set changes under us (done
+        # callbacks run on the executor threads), so wait on a copy.
+        _, listings = self.late_listings
+        if listings:
+            asyncio.run_coroutine_threadsafe(asyncio.wait(list(listings)), self.loop).result()
+        wait(list(self.in_flight))
+
+    def close(self):
+        # Pages still running are cancelled (their run_page raises) before
+        # the loop stops, so no caller is left waiting on it
+        async def shutdown():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.session:
+                await self.session.close()
+        if self.closed:
+            return
+        self.closed = True
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.executor.shutdown(wait=False)
+
+    async def _ensure_session(self):
+        if self.session is None:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                headers={'User-Agent': USER_AGENT},
+                timeout=aiohttp.ClientTimeout(sock_connect=REQUEST_TIMEOUT[0], sock_read=REQUEST_TIMEOUT[1])
+            )
+
+    async def _get(self, url, header_check=None):
+        _, _, body = await self._request(url, header_check)
+        return body
+
+    async def _request(self, url, header_check=None, headers=None):
+        # Returns (status, headers, body). Same policy as HttpClient: back
+        # off on 429/5xx (honouring Retry-After) and on connection or read
+        # errors, and respect Reddit's rate-limit headers. header_check as in HttpClient.get_content()
+        host = urlsplit(url).hostname
+        for attempt in range(ASYNC_RETRIES + 1):
+            delay = self.http.rate_limit_delay(host)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            try:
+                async with self.semaphore:
+                    async with self.session.get(url, headers=headers) as response:
+                        self.http.update_rate_limit(host, response.headers)
+                        if response.status not in HttpClient.RETRY_STATUSES or attempt == ASYNC_RETRIES:
+                            response.raise_for_status()
+                            if not header_check:
+                                return response.status, response.headers, await response.read()
+                            probe = HeaderProbe(url, header_check)
+                            body = bytearray()
+                            async for chunk in response.content.iter_chunked(PROBE_CHUNK_SIZE):
+                                body += chunk
+                                try:
+                                    if probe.pending:
+                                        await self._run_in_executor(probe.feed, bytes(body))
+                                except ImageRejected:
+                                    # Drop the connection rather than drain the body
+                                    response.close()
+                                    raise
+                            return response.status, response.headers, bytes(body)
+                        retry_after = response.headers.get('Retry-After', '')
+                        backoff = float(retry_after) if retry_after.isdigit() else 0.5 * 2 ** attempt
+            except aiohttp.ClientResponseError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                # Connection and read errors are retried too, like urllib3's Retry
+                if attempt == ASYNC_RETRIES:
+                    raise
+                backoff = 0.5 * 2 ** attempt
+            await asyncio.sleep(backoff)
+
+    async def _fetch_listing(self, search, name):
+        # Same caching as wallpaper_core.fetch_listing()
+        after = search.after_ids.get(name)
+        url = listing_url(name, after, search.limit, search.base_url)
+        cache = search.listing_cache
+        with METRICS.span('listing.fetch'):
+            if cache is None:
+                content = await self._get(url)
+                METRICS.count('listing.bytes', len(content))
+                return parse_listing(name, json.loads(content))
+            
+            key = ListingCache.key(name, after, search.limit)
+            content = cache.fresh(key)
+            if content is not None:
+                METRICS.count('listing_cache.hits')
+            else:
+                status, headers, content = await self._request(url, headers=cache.validators(key))
+                if status == 304:
+                    content = cache.revalidated(key)
+                    if content is None:
+                        # Evicted since the request went out, ask again
+                        status, headers, content = await self._request(url)
+                    else:
+                        METRICS.count('listing_cache.revalidated')
+                if status != 304:
+                    METRICS.count('listing.bytes', len(content))
+                    cache.store(key, content, headers)
+            return parse_listing(name, json.loads(content))
+
+    def _run_in_executor(self, function, *args):
+        future = self.executor.submit(function, *args)
+        self.in_flight.add(future)
+        future.add_done_callback(self.in_flight.discard)
+        return asyncio.wrap_future(future)
+
+    async def _process(self, task, post_data, header_check):
+        try:
+            result = await self._run_in_executor(task.cached, post_data)
+            if result is not ImageTask.MISS:
+                return result
+            with METRICS.span('image.download'):
+                content = await self._get(task.url(post_data), header_check)
+            METRICS.count('image.bytes', len(content))
+            return await self._run_in_executor(task.finish, post_data, content)
+        except ImageRejected:
+            return None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error processing image: {e}")
+            return None
+
+    async def _run_page(self, search, task, on_result, cancel_event, max_results):
+        await self._ensure_session()
+
+        # As in the thread engine, listings are only requested once the
+        # queue can't fill the page, and each one's posts are queued (and
+        # start downloading) as soon as it arrives
+        late_search, listings = self.late_listings
+        self.late_listings = (None, {})
+        if late_search is not search:
+            listings = {}
+        requested = False
+
+        # Up to `concurrency` candidates, but no more than the page still
+        # needs, are in flight ahead of the next result; the semaphore and
+        # connector bound the actual requests
+        candidates = []
+        tasks = []
+        next_index = 0
+        found = 0
+        closing = False
+        try:
+            while max_results is None or found < max_results:
+                for listing in [listing for listing in listings if listing.done()]:
+                    await self._run_in_executor(search.add_listing, listings.pop(listing),
+                                                listing.exception() or listing.result())
+                if not requested and needs_listings(search, max_results, found, len(tasks) - next_index):
+                    fetching = set(listings.values())
+                    for name in search.listings_due():
+                        if name in fetching:
+                            continue
+                        listings[asyncio.ensure_future(self._fetch_listing(search, name))] = name
+                    requested = True
+
+                while len(tasks) - next_index < look_ahead(self.concurrency, max_results, found):
+                    post_data = search.next_candidate()
+                    if post_data is None:
+                        break
+                    candidates.append(post_data)
+                    tasks.append(asyncio.ensure_future(
+                        self._process(task, post_data, search.header_check(post_data))
+                    ))
+
+                if next_index == len(tasks) and not listings:
+                    break
+                waiting_for = set(listings)
+                if next_index < len(tasks):
+                    waiting_for.add(tasks[next_index])
+                await asyncio.wait(waiting_for, timeout=0.1, return_when=asyncio.FIRST_COMPLETED)
+                if cancel_event.is_set():
+                    return found
+                if next_index == len(tasks) or not tasks[next_index].done():
+                    continue
+
+                post_data = candidates[next_index]
+                result = tasks[next_index].result()
+                next_index += 1
+
+                if not await self._run_in_executor(search.accept, post_data, result):
+                    continue
+                on_result(post_data, result, found)
+                found += 1
+
+            return found
+        except asyncio.CancelledError:
+            # close()
+            closing = True
+            raise
+        finally:
+            for pending in tasks[next_index:]:
+                pending.cancel()
+            # Whatever the page took but didn't need is kept for the next one
+            search.requeue(candidates[next_index:])
+            # Listings still on their way go to the next page, unless cancelled
+            if cancel_event.is_set() or closing:
+                for listing in listings:
+                    listing.cancel()
+            elif listings:
+                self.late_listings = (search, listings)
+
+def needs_listings(search, max_results, found, in_flight):
+    # A page asks for the next listings only once the candidates queued and
+    # in flight can't fill it (every time when there is no limit), so the
+    # queue doesn't grow past what the pages use
+    return max_results is None or search.queued_count() + in_flight < max_results - found
+
+def look_ahead(limit, max_results, found):
+    # Candidates a page may have started ahead of the next result: the
+    # engine's limit, or fewer if the page needs fewer results than that
+    if max_results is None:
+        return limit
+    return min(limit, max_results - found)
+
+def create_fetch_engine(name, http, workers=DEFAULT_DOWNLOAD_WORKERS):
+    # workers: parallel downloads, the thread pool's size or the asyncio
+    # engine's concurrency
+    if name == 'asyncio':
+        return AsyncioFetchEngine(http, workers)
+    return ThreadFetchEngine(http, workers)
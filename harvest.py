@@ -0,0 +1,120 @@
+# Headless wallpaper harvesting, e.g. on a server:
+#
+#   python harvest.py wallpapers,widescreenwallpaper -r 3840x2160 -p 5 -c 8 -o ./walls
+#
+# Uses the same listing, filtering and download code as the GUI (wallpaper_core)
+# but never imports PyQt6.
+import argparse
+import os
+import sys
+
+from wallpaper_core import (DEFAULT_WALLPAPER_DIR, DEFAULT_DOWNLOAD_WORKERS, HttpClient, ImageRejected, ImageTask,
+                            ListingUnavailable, WallpaperStore, WallpaperSearch, parse_resolution, read_dimensions)
+from wallpaper_index import DEFAULT_INDEX_PATH, WallpaperIndex
+from fetch_engines import FETCH_ENGINES, create_fetch_engine
+from metrics import METRICS, REJECTED_BY_HEADER, REJECTED_BY_METADATA
+
+class HarvestTask(ImageTask):
+    # Saves originals into the content-addressed store and keeps the ones
+    # whose real size matches the search
+    def __init__(self, store, search):
+        self.store = store
+        self.search = search
+
+    def cached(self, post_data):
+        path = self.store.lookup(post_data['url'])
+        return self.check(post_data, path, stored_now=False) if path else self.MISS
+
+    def run(self, http, post_data, header_check=None):
+        # Thread engine: stream straight to disk instead of holding the body
+        result = self.cached(post_data)
+        if result is not self.MISS:
+            return result
+        try:
+            path = self.store.fetch(post_data['url'], header_check=header_check)
+        except ImageRejected:
+            return None
+        return self.check(post_data, path, stored_now=True)
+
+    def finish(self, post_data, content):
+        return self.check(post_data, self.store.add(post_data['url'], content), stored_now=True)
+
+    def check(self, post_data, path, stored_now):
+        width, height = read_dimensions(path)
+        if not self.search.matches(width, height):
+            if stored_now:
+                self.store.discard(post_data['url'])
+            return None
+        return {'path': path, 'width': width, 'height': height}
+
+def harvest(subreddit_names, resolution=None, pages=1, concurrency=DEFAULT_DOWNLOAD_WORKERS,
+            output_dir=DEFAULT_WALLPAPER_DIR, limit=None, engine='thread', index_path=DEFAULT_INDEX_PATH,
+            out=sys.stdout):
+    os.makedirs(output_dir, exist_ok=True)
+    http = HttpClient(concurrency + 4)
+    index = WallpaperIndex(index_path)
+    store = WallpaperStore(output_dir, http, index)
+    fetch_engine = create_fetch_engine(engine, http, concurrency)
+    search = WallpaperSearch(fetch_engine, subreddit_names, resolution, limit=limit, index=index)
+    task = HarvestTask(store, search)
+
+    def on_result(post_data, result, index):
+        print(f"{result['path']}\t{result['width']}x{result['height']}\t"
+              f"{post_data['subreddit_display']}\t{post_data['title']}", file=out, flush=True)
+
+    saved = 0
+    try:
+        for _ in range(pages):
+            if not search.has_more():
+                break
+            # Harvesting keeps every match of a listing page, not just a screenful
+            try:
+                saved += search.fetch_page(task, on_result, max_results=None)
+            except ListingUnavailable as e:
+                print(f"Stopping, no listing could be fetched: {e}", file=sys.stderr)
+                break
+    finally:
+        fetch_engine.close()
+    return saved, METRICS.snapshot()['counters']
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download wallpapers from Reddit without the GUI.")
+    parser.add_argument('subreddits', help="comma-separated subreddit names")
+    parser.add_argument('-r', '--resolution',
+                        help="only keep images of this size (e.g. 1920x1080), either orientation, within 100px")
+    parser.add_argument('-p', '--pages', type=int, default=1,
+                        help="listing pages to fetch from each subreddit (default: 1)")
+    parser.add_argument('-c', '--concurrency', type=int, default=DEFAULT_DOWNLOAD_WORKERS,
+                        help=f"parallel downloads (default: {DEFAULT_DOWNLOAD_WORKERS})")
+    parser.add_argument('-o', '--output', default=DEFAULT_WALLPAPER_DIR,
+                        help=f"directory to save into (default: {DEFAULT_WALLPAPER_DIR})")
+    parser.add_argument('--limit', type=int, help="posts per listing page and subreddit")
+    parser.add_argument('--engine', choices=FETCH_ENGINES, default='thread',
+                        help="fetch engine (default: thread, asyncio needs aiohttp)")
+    parser.add_argument('--index', default=DEFAULT_INDEX_PATH,
+                        help=f"metadata index shared with the app (default: {DEFAULT_INDEX_PATH})")
+    parser.add_argument('--metrics', help="write timings and counters to this file (.csv for CSV, else JSON)")
+    args = parser.parse_args(argv)
+
+    try:
+        parse_resolution(args.resolution)
+    except ValueError:
+        parser.error(f"invalid resolution: {args.resolution}")
+    if args.pages < 1 or args.concurrency < 1:
+        parser.error("--pages and --concurrency must be at least 1")
+
+    subreddit_names = [s.strip() for s in args.subreddits.split(',')]
+    try:
+        saved, stats = harvest(subreddit_names, args.resolution, args.pages, args.concurrency, args.output,
+                               args.limit, args.engine, args.index)
+    except RuntimeError as e:
+        parser.error(str(e))
+    print(f"Saved {saved} wallpapers to {args.output} "
+          f"({stats.get(REJECTED_BY_METADATA, 0)} downloads skipped using known image sizes, "
+          f"{stats.get(REJECTED_BY_HEADER, 0)} stopped after the image header)", file=sys.stderr)
+    if args.metrics:
+        METRICS.export(args.metrics)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
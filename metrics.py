@@ -0,0 +1,109 @@
+# Timing spans and counters for the hot paths (listing fetches, image
+# downloads, thumbnail rendering and caching, cards, setting wallpapers),
+# shown live in the app's Settings tab and exported as JSON or CSV. One
+# process-wide collector, METRICS, is shared by every thread; nothing in
+# here may import PyQt6.
+#
+#   with METRICS.span('listing.fetch'):
+#       ...
+#   METRICS.count('listing.bytes', len(content))
+import csv
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from threading import Lock
+
+SPAN_SAMPLES = 512  # recent durations kept per span for the percentiles
+
+# Counters the app reads back, e.g. for harvest.py's summary
+REJECTED_BY_METADATA = 'candidates.rejected_by_metadata'
+REJECTED_BY_HEADER = 'candidates.rejected_by_header'
+REJECTED_AFTER_DOWNLOAD = 'candidates.rejected_after_download'
+
+CSV_FIELDS = ('kind', 'name', 'count', 'total_ms', 'mean_ms', 'p50_ms', 'p95_ms', 'max_ms')
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+class Metrics:
+    def __init__(self):
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.spans = {}  # name -> {'count', 'total', 'max', 'recent'} in seconds
+            self.counters = {}
+
+    @contextmanager
+    def span(self, name):
+        # Times the block, whether it returns or raises
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name, seconds):
+        with self.lock:
+            span = self.spans.get(name)
+            if span is None:
+                span = self.spans[name] = {'count': 0, 'total': 0.0, 'max': 0.0,
+                                           'recent': deque(maxlen=SPAN_SAMPLES)}
+            span['count'] += 1
+            span['total'] += seconds
+            span['max'] = max(span['max'], seconds)
+            span['recent'].append(seconds)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def counter(self, name):
+        with self.lock:
+            return self.counters.get(name, 0)
+
+    def snapshot(self):
+        # Plain data, safe to hand to another thread or json.dump. Span
+        # times are in milliseconds, percentiles over the recent samples.
+        with self.lock:
+            spans = {name: dict(span, recent=sorted(span['recent'])) for name, span in self.spans.items()}
+            counters = dict(self.counters)
+            started = self.started
+        return {
+            'started': started,
+            'elapsed': time.time() - started,
+            'spans': {
+                name: {
+                    'count': span['count'],
+                    'total_ms': span['total'] * 1000,
+                    'mean_ms': span['total'] / span['count'] * 1000,
+                    'p50_ms': percentile(span['recent'], 0.5) * 1000,
+                    'p95_ms': percentile(span['recent'], 0.95) * 1000,
+                    'max_ms': span['max'] * 1000
+                }
+                for name, span in sorted(spans.items())
+            },
+            'counters': dict(sorted(counters.items()))
+        }
+
+    def export(self, path):
+        # CSV for a .csv path (one row per span or counter), JSON otherwise
+        snapshot = self.snapshot()
+        if not path.lower().endswith('.csv'):
+            with open(path, 'w') as f:
+                json.dump(snapshot, f, indent=2)
+            return
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, CSV_FIELDS)
+            writer.writeheader()
+            for name, span in snapshot['spans'].items():
+                writer.writerow(dict(span, kind='span', name=name))
+            for name, value in snapshot['counters'].items():
+                writer.writerow({'kind': 'counter', 'name': name, 'count': value})
+
+METRICS = Metrics()
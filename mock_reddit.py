@@ -0,0 +1,236 @@
+# A local stand-in for reddit.com and i.redd.it, used by benchmark.py so
+# searches can be timed offline and reproducibly. Serves synthetic
+# /r/<name>/hot.json listings and generated JPEG/PNG images with configurable
+# sizes, latency and bandwidth. Can also be run on its own and pointed at:
+#
+#   python mock_reddit.py --port 8765 --image-size 3840x2160 --latency 50
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from io import BytesIO
+from threading import Lock, Thread
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image
+
+from wallpaper_core import parse_resolution
+
+LISTING_PATH = re.compile(r'^/r/(\w+)/\w+\.json$')
+IMAGE_PATH = re.compile(r'^/img/(\w+)/(\d+)(?:_(\d+))?\.(jpg|png)$')
+PREVIEW_WIDTHS = (108, 216, 320, 640, 960)
+IMAGE_VARIANTS = 4  # distinct generated images per size, reused round robin
+WRITE_CHUNK_SIZE = 16 * 1024
+
+class MockReddit:
+    def __init__(self, image_sizes=((1920, 1080),), image_format='jpeg', latency=0.0, listing_latency=0.0,
+                 bandwidth=None, posts_per_subreddit=500, previews=True, port=0, listing_jitter=0.0):
+        # latency: seconds before each image response, listing_latency the
+        # same for listings plus up to listing_jitter at random; bandwidth: bytes/sec per response (None: as fast
+        # as the socket goes). Post i of a subreddit has image_sizes[i % n].
+        # Without previews the listing has no sizes or smaller renditions, so
+        # every candidate has to be downloaded.
+        self.image_sizes = list(image_sizes)
+        self.image_format = image_format
+        self.latency = latency
+        self.listing_latency = listing_latency
+        self.listing_jitter = listing_jitter
+        self.bandwidth = bandwidth
+        self.posts_per_subreddit = posts_per_subreddit
+        self.previews = previews
+        self.lock = Lock()
+        self.images = {}  # (width, height, format, variant) -> encoded bytes
+        self.image_locks = {}  # same keys: one request generates it, the others wait
+        self.stats = {'listings': 0, 'images': 0, 'bytes': 0}
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+    def listing(self, subreddit, after, limit):
+        start = int(after.rsplit('_', 1)[1]) if after else 0
+        end = min(start + limit, self.posts_per_subreddit)
+        extension = 'png' if self.image_format == 'png' else 'jpg'
+        children = []
+        for number in range(start, end):
+            width, height = self.image_sizes[number % len(self.image_sizes)]
+            url = f'{self.url}/img/{subreddit}/{number}.{extension}'
+            post = {
+                'id': f'{subreddit}{number}',
+                'name': f't3_{subreddit}_{number}',
+                'title': f'Mock wallpaper {number} [{width}x{height}]',
+                'subreddit': subreddit,
+                'url': url
+            }
+            if self.previews:
+                post['preview'] = {'images': [{
+                    'source': {'url': url, 'width': width, 'height': height},
+                    'resolutions': [
+                        {'url': f'{self.url}/img/{subreddit}/{number}_{preview_width}.jpg',
+                         'width': preview_width, 'height': preview_width * height // width}
+                        for preview_width in PREVIEW_WIDTHS if preview_width < width
+                    ]
+                }]}
+            children.append({'kind': 't3', 'data': post})
+        next_after = f't3_{subreddit}_{end}' if end < self.posts_per_subreddit else None
+        return {'kind': 'Listing', 'data': {'after': next_after, 'children': children}}
+
+    def image(self, width, height, image_format, variant):
+        # Noise keeps the encoded size close to a real photo's. It is seeded
+        # by the key, so every run (and every request) gets the same bytes.
+        key = (width, height, image_format, variant)
+        content = self.images.get(key)
+        if content is not None:
+            return content
+        with self.lock:
+            image_lock = self.image_locks.setdefault(key, Lock())
+        with image_lock:
+            content = self.images.get(key)
+            if content is None:
+                gradient = Image.linear_gradient('L').resize((width, height))
+                noise = Image.frombytes('L', (width, height), random.Random(repr(key)).randbytes(width * height))
+                # Uniform noise squeezed to about the spread of Gaussian noise with this sigma
+                sigma = 40 + 10 * variant
+                noise = noise.point([min(max(128 + (value - 128) * sigma * 17 // 1280, 0), 255)
+                                     for value in range(256)])
+                image = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+                buffer = BytesIO()
+                if image_format == 'png':
+                    image.save(buffer, 'PNG')
+                else:
+                    image.save(buffer, 'JPEG', quality=90)
+                content = self.images[key] = buffer.getvalue()
+        return content
+
+    def prepare(self):
+        # Generates every image the listings point at, originals and preview
+        # renditions, so no request waits for one
+        for number in range(len(self.image_sizes) * IMAGE_VARIANTS):
+            width, height = self.image_sizes[number % len(self.image_sizes)]
+            self.image(width, height, self.image_format, number % IMAGE_VARIANTS)
+            if self.previews:
+                for preview_width in PREVIEW_WIDTHS:
+                    if preview_width < width:
+                        self.image(preview_width, preview_width * height // width, 'jpeg', number % IMAGE_VARIANTS)
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                match = LISTING_PATH.match(parts.path)
+                if match:
+                    return self.send_listing(match.group(1), parse_qs(parts.query))
+                match = IMAGE_PATH.match(parts.path)
+                if match:
+                    return self.send_image(match.group(1), int(match.group(2)), match.group(3), match.group(4))
+                self.send_body(404, 'text/plain', b'not found')
+
+            def send_listing(self, subreddit, query):
+                time.sleep(mock.listing_latency + random.uniform(0, mock.listing_jitter))
+                after = query.get('after', [None])[0]
+                limit = int(query.get('limit', ['25'])[0])
+                with mock.lock:
+                    mock.stats['listings'] += 1
+                body = json.dumps(mock.listing(subreddit, after, limit)).encode('utf-8')
+                self.send_body(200, 'application/json', body)
+
+            def send_image(self, subreddit, number, preview_width, extension):
+                time.sleep(mock.latency)
+                width, height = mock.image_sizes[number % len(mock.image_sizes)]
+                image_format = 'png' if extension == 'png' else 'jpeg'
+                if preview_width:
+                    width, height = int(preview_width), int(preview_width) * height // width
+                    image_format = 'jpeg'
+                with mock.lock:
+                    mock.stats['images'] += 1
+                body = mock.image(width, height, image_format, number % IMAGE_VARIANTS)
+                self.send_body(200, f'image/{image_format}', body)
+
+            def send_body(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                try:
+                    for offset in range(0, len(body), WRITE_CHUNK_SIZE):
+                        chunk = body[offset:offset + WRITE_CHUNK_SIZE]
+                        self.wfile.write(chunk)
+                        with mock.lock:
+                            mock.stats['bytes'] += len(chunk)
+                        if mock.bandwidth:
+                            time.sleep(len(chunk) / mock.bandwidth)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up on the rest (e.g. a rejected header)
+                    self.close_connection = True
+
+        return Handler
+
+def parse_image_sizes(text):
+    sizes = [parse_resolution(size.strip()) for size in text.split(',') if size.strip()]
+    if not sizes or None in sizes:
+        raise ValueError(f"invalid image sizes: {text}")
+    return sizes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve synthetic Reddit listings and images locally.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--image-size', default='1920x1080',
+                        help="comma-separated sizes of the generated images, used in turn (default: 1920x1080)")
+    parser.add_argument('--format', choices=('jpeg', 'png'), default='jpeg', help="image format (default: jpeg)")
+    parser.add_argument('--latency', type=float, default=0, help="milliseconds before each image response")
+    parser.add_argument('--listing-latency', type=float, default=0, help="milliseconds before each listing")
+    parser.add_argument('--listing-jitter', type=float, default=0,
+                        help="up to this many milliseconds more per listing, at random")
+    parser.add_argument('--bandwidth', type=float, help="KiB/s per response (default: unlimited)")
+    parser.add_argument('--no-previews', action='store_true', help="leave sizes and previews out of listings")
+    args = parser.parse_args(argv)
+    try:
+        image_sizes = parse_image_sizes(args.image_size)
+    except ValueError as e:
+        parser.error(str(e))
+
+    mock = MockReddit(image_sizes, args.format, args.latency / 1000, args.listing_latency / 1000,
+                      args.bandwidth * 1024 if args.bandwidth else None, previews=not args.no_previews,
+                      port=args.port, listing_jitter=args.listing_jitter / 1000)
+    print(f"Serving on {mock.url}, e.g. {mock.url}/r/wallpapers/hot.json")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
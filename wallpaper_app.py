@@ -0,0 +1,1818 @@
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
+                           QHBoxLayout, QLineEdit, QPushButton, QLabel, 
+                           QFileDialog, QMessageBox, QMenu, QMenuBar, QTabWidget, QDialog, QGroupBox, QRadioButton,
+                           QSpinBox, QCheckBox, QProgressBar, QListView, QAbstractItemView, QStyledItemDelegate,
+                           QStyle, QComboBox, QTableWidget, QTableWidgetItem, QHeaderView,
+                           QScrollArea, QFrame)
+from PyQt6.QtCore import (Qt, QSize, QTimer, pyqtSignal, QRect, QSettings,
+                          QAbstractListModel, QModelIndex, QEvent, QPoint)
+from PyQt6.QtGui import QPixmap, QImage, QPainter, QTransform, QFont, QColor
+import sys
+import os
+import platform
+import ctypes
+import subprocess
+import uuid
+from collections import OrderedDict
+from threading import Thread, Event, Lock, Condition
+from queue import Queue
+from concurrent.futures import ThreadPoolExecutor
+import wallpaper_core
+from wallpaper_core import (DEFAULT_WALLPAPER_DIR, THUMBNAIL_SIZE, IMAGES_PER_PAGE, DEFAULT_DOWNLOAD_WORKERS,
+                            MAX_DOWNLOAD_WORKERS, THUMBNAIL_CACHE_MAX_BYTES, APP_DATA_DIR, DownloadCancelled,
+                            IMAGE_EXTENSIONS, HttpClient, ListingCache, WallpaperStore, ThumbnailCache,
+                            ThumbnailTask, WallpaperSearch, ListingUnavailable, matches_resolution, parse_resolution)
+from wallpaper_index import WallpaperIndex
+from metrics import METRICS
+from fetch_engines import create_fetch_engine
+
+COMMON_RESOLUTIONS = [
+    "All Resolutions",
+    "1920x1080 (FHD)",
+    "2560x1440 (2K)",
+    "3840x2160 (4K)",
+    "1366x768",
+    "1280x720 (HD)",
+    "3440x1440 (UW)",
+]
+
+PIXMAP_CACHE_SIZE = 200  # decoded thumbnails kept per grid
+DEFAULT_CARDS_AHEAD = 36  # cards loaded past the last visible one
+MAX_CARDS_AHEAD = 180
+JOB_WORKERS = 2
+THUMBNAIL_WORKERS = os.cpu_count() or 4  # threads the grids request thumbnails on
+
+class LoadingSpinner(QLabel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.angle = 0
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.rotate)
+        self.setStyleSheet("""
+            QLabel {
+                background-color: rgba(0, 0, 0, 0.7);
+                border-radius: 10px;
+                padding: 20px;
+                font-size: 24px;
+                color: white;
+            }
+        """)
+        self.setText("⟳")  # Using a unicode character as spinner
+        self.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.hide()
+
+    def rotate(self):
+        self.angle = (self.angle + 36) % 360
+        # Use Qt's native transformation
+        transform = QTransform().rotate(self.angle)
+        # Create a new pixmap with the rotated text
+        pixmap = QPixmap(self.size())
+        pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(pixmap)
+        painter.setFont(QFont("Arial", 24))
+        painter.setPen(Qt.GlobalColor.white)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setRenderHint(QPainter.RenderHint.TextAntialiasing)
+        painter.translate(pixmap.width() / 2, pixmap.height() / 2)
+        painter.rotate(self.angle)
+        painter.drawText(QRect(-20, -20, 40, 40), Qt.AlignmentFlag.AlignCenter, "⟳")
+        painter.end()
+        self.setPixmap(pixmap)
+
+    def start(self):
+        self.show()
+        self.timer.start(50)  # Update every 50ms for smoother rotation
+
+    def stop(self):
+        self.timer.stop()
+        self.hide()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        # Update the pixmap when the widget is resized
+        self.rotate()
+
+class WallpaperListModel(QAbstractListModel):
+    # Rows hold metadata only. Decoded thumbnails live in a bounded LRU of
+    # pixmaps, and a row painted without one asks for it via thumbnail_needed
+    # (answered from the disk cache), so memory stays flat however many rows
+    # there are.
+    ItemRole = Qt.ItemDataRole.UserRole
+    PixmapRole = Qt.ItemDataRole.UserRole + 1
+    
+    thumbnail_needed = pyqtSignal(str)  # row key
+    
+    def __init__(self, max_pixmaps=PIXMAP_CACHE_SIZE, parent=None):
+        super().__init__(parent)
+        self.max_pixmaps = max_pixmaps
+        self.items = []
+        self.rows = {}  # key -> row
+        self.pixmaps = OrderedDict()
+        self.requested = set()
+        self.failed = set()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.items)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        item = self.items[index.row()]
+        
+        if role == self.ItemRole:
+            return item
+        if role == self.PixmapRole:
+            key = item['key']
+            pixmap = self.pixmaps.get(key)
+            if pixmap is not None:
+                self.pixmaps.move_to_end(key)
+            elif key not in self.requested and key not in self.failed:
+                self.requested.add(key)
+                self.thumbnail_needed.emit(key)
+            return pixmap
+        if role == Qt.ItemDataRole.DisplayRole:
+            return item['title']
+        return None
+
+    def item(self, key):
+        row = self.rows.get(key)
+        return None if row is None else self.items[row]
+
+    def append_item(self, item, processed_data=None):
+        row = len(self.items)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.items.append(item)
+        self.rows[item['key']] = row
+        self.endInsertRows()
+        if processed_data:
+            self.set_thumbnail(item['key'], processed_data)
+
+    def sync_items(self, items):
+        # Turn the current rows into items (both in the same order) with
+        # row inserts/removes, keeping the thumbnails of rows that stay
+        keys = {item['key'] for item in items}
+        for row in range(len(self.items) - 1, -1, -1):
+            if self.items[row]['key'] not in keys:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                removed = self.items.pop(row)
+                self.pixmaps.pop(removed['key'], None)
+                self.failed.discard(removed['key'])
+                self.endRemoveRows()
+        
+        for row, item in enumerate(items):
+            if row >= len(self.items) or self.items[row]['key'] != item['key']:
+                self.beginInsertRows(QModelIndex(), row, row)
+                self.items.insert(row, item)
+                self.endInsertRows()
+        
+        self.rows = {item['key']: row for row, item in enumerate(self.items)}
+
+    def clear(self):
+        self.beginResetModel()
+        self.items = []
+        self.rows = {}
+        self.pixmaps.clear()
+        self.requested.clear()
+        self.failed.clear()
+        self.endResetModel()
+
+    def set_thumbnail(self, key, processed_data):
+        self.requested.discard(key)
+        row = self.rows.get(key)
+        if row is None:
+            return
+        if not processed_data:
+            self.failed.add(key)
+        else:
+            item = self.items[row]
+            item['width'] = processed_data['width']
+            item['height'] = processed_data['height']
+            # Raw pixels from the worker, nothing to decode on the GUI thread
+            width, height = processed_data['thumbnail_size']
+            if processed_data['mode'] == 'RGBA':
+                qimg = QImage(processed_data['pixels'], width, height, width * 4, QImage.Format.Format_RGBA8888)
+            else:
+                qimg = QImage(processed_data['pixels'], width, height, width * 3, QImage.Format.Format_RGB888)
+            self.pixmaps[key] = QPixmap.fromImage(qimg)
+            self.pixmaps.move_to_end(key)
+            while len(self.pixmaps) > self.max_pixmaps:
+                self.pixmaps.popitem(last=False)
+        
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+class WallpaperCardDelegate(QStyledItemDelegate):
+    # Paints a card (thumbnail, two buttons, hover info) straight onto the
+    # view, no widgets are created per image
+    set_wallpaper_clicked = pyqtSignal(str)
+    download_clicked = pyqtSignal(str, str)
+    
+    CARD_WIDTH = THUMBNAIL_SIZE + 40
+    CARD_HEIGHT = THUMBNAIL_SIZE + 90
+    PADDING = 10
+    BUTTON_HEIGHT = 34
+
+    def sizeHint(self, option, index):
+        return QSize(self.CARD_WIDTH, self.CARD_HEIGHT)
+
+    def card_rects(self, rect):
+        card = QRect(rect.topLeft(), QSize(self.CARD_WIDTH, self.CARD_HEIGHT))
+        inner = card.adjusted(self.PADDING, self.PADDING, -self.PADDING, -self.PADDING)
+        image_rect = QRect(inner.left(), inner.top(), inner.width(), inner.height() - self.BUTTON_HEIGHT - self.PADDING)
+        button_top = image_rect.bottom() + self.PADDING
+        button_width = (inner.width() - self.PADDING) // 2
+        set_rect = QRect(inner.left(), button_top, button_width, self.BUTTON_HEIGHT)
+        download_rect = QRect(set_rect.right() + self.PADDING + 1, button_top, button_width, self.BUTTON_HEIGHT)
+        return card, image_rect, set_rect, download_rect
+
+    def paint(self, painter, option, index):
+        item = index.data(WallpaperListModel.ItemRole)
+        pixmap = index.data(WallpaperListModel.PixmapRole)
+        card, image_rect, set_rect, download_rect = self.card_rects(option.rect)
+        hovered = bool(option.state & QStyle.StateFlag.State_MouseOver)
+        
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor('#404040' if hovered else '#363636'))
+        painter.drawRoundedRect(card, 8, 8)
+        
+        painter.setPen(QColor('white'))
+        if pixmap is not None:
+            size = pixmap.size()
+            if size.width() > image_rect.width() or size.height() > image_rect.height():
+                size = size.scaled(image_rect.size(), Qt.AspectRatioMode.KeepAspectRatio)
+            target = QRect(QPoint(0, 0), size)
+            target.moveCenter(image_rect.center())
+            painter.drawPixmap(target, pixmap)
+        else:
+            painter.drawText(image_rect, Qt.AlignmentFlag.AlignCenter, "Loading...")
+        
+        for rect, label in ((set_rect, "Set as Wallpaper"), (download_rect, "Download")):
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QColor('#0d6efd'))
+            painter.drawRoundedRect(rect, 4, 4)
+            painter.setPen(QColor('white'))
+            painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, label)
+        
+        if hovered and item.get('width'):
+            info_text = f"{item['subreddit']}\n" if item.get('subreddit') else ""
+            info_text += f"Resolution: {item['width']}x{item['height']}\n{item['title']}"
+            flags = Qt.AlignmentFlag.AlignCenter | Qt.TextFlag.TextWordWrap
+            text_rect = painter.boundingRect(image_rect.adjusted(8, 8, -8, -8), flags, info_text)
+            info_rect = QRect(image_rect.left(), image_rect.bottom() - text_rect.height() - 16,
+                              image_rect.width(), text_rect.height() + 16)
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QColor(0, 0, 0, 204))
+            painter.drawRoundedRect(info_rect, 4, 4)
+            painter.setPen(QColor('white'))
+            painter.drawText(info_rect.adjusted(8, 8, -8, -8), flags, info_text)
+        
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.Type.MouseButtonRelease
+                and event.button() == Qt.MouseButton.LeftButton):
+            item = index.data(WallpaperListModel.ItemRole)
+            _, _, set_rect, download_rect = self.card_rects(option.rect)
+            pos = event.position().toPoint()
+            if set_rect.contains(pos):
+                self.set_wallpaper_clicked.emit(item['url'])
+                return True
+            if download_rect.contains(pos):
+                self.download_clicked.emit(item['url'], item['title'])
+                return True
+        return super().editorEvent(event, model, option, index)
+
+class WallpaperDownloader(QMainWindow):
+    image_loaded = pyqtSignal(dict)
+    page_loaded = pyqtSignal()
+    loading_finished = pyqtSignal()
+    feed_failed = pyqtSignal(str)
+    job_progress = pyqtSignal(str, int, int)  # job id, bytes received, total (-1 if unknown)
+    job_finished = pyqtSignal(str, str, str)  # job id, 'info' or 'warning', message
+    job_failed = pyqtSignal(str, str)
+    job_cancelled = pyqtSignal(str)
+    thumbnail_ready = pyqtSignal(dict)
+    local_files_changed = pyqtSignal(str)  # directory
+    local_scan_failed = pyqtSignal(str)
+    
+    def __init__(self):
+        super().__init__()
+        self.settings = QSettings('RedditWallpaperDownloader', 'WallpaperDownloader')
+        self.current_images = []
+        self.os_name = platform.system()
+        self.search = None
+        # Every result of the current search, whatever the filter shown
+        self.session_images = []
+        self.resolution_filter = None
+        self.fetch_cancel_event = None
+        self.feed = None  # the browse grid's infinite scroll producer
+        self.load_settings()
+        self.http = HttpClient(self.http_pool_size())
+        self.fetch_engine = self.create_fetch_engine()
+        self.wallpaper_index = WallpaperIndex()
+        # Listings are reused for a couple of minutes across searches
+        self.listing_cache = ListingCache()
+        self.wallpaper_store = WallpaperStore(self.wallpaper_directory, self.http, self.wallpaper_index)
+        
+        # Set as Wallpaper / Download run on background workers
+        self.jobs = {}
+        self.job_queue = Queue()
+        self.apply_lock = Lock()
+        for _ in range(JOB_WORKERS):
+            Thread(target=self._job_worker, daemon=True).start()
+        
+        # Thumbnails the grids ask for while scrolling
+        self.thumbnail_executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS)
+        
+        self.thumbnail_cache = ThumbnailCache(
+            os.path.join(APP_DATA_DIR, 'thumbnails'),
+            int(self.settings.value('thumbnail_cache_bytes', THUMBNAIL_CACHE_MAX_BYTES))
+        )
+        self.setup_ui()
+        
+        # Connect signals
+        self.image_loaded.connect(self.add_image_to_grid)
+        self.page_loaded.connect(self.on_page_loaded)
+        self.loading_finished.connect(self.on_loading_finished)
+        self.feed_failed.connect(
+            lambda error: QMessageBox.warning(self, "Warning", f"Could not fetch more wallpapers: {error}")
+        )
+        self.job_progress.connect(self.on_job_progress)
+        self.job_finished.connect(self.on_job_finished)
+        self.job_failed.connect(self.on_job_failed)
+        self.job_cancelled.connect(self.on_job_cancelled)
+        self.thumbnail_ready.connect(self.on_thumbnail_ready)
+        self.local_files_changed.connect(self.show_local_files)
+        self.local_scan_failed.connect(
+            lambda error: QMessageBox.critical(self, "Error", f"Error loading wallpapers: {error}")
+        )
+        
+    def setup_ui(self):
+        self.setWindowTitle("Reddit Wallpaper Downloader")
+        
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        main_layout = QVBoxLayout(central_widget)
+        main_layout.setSpacing(20)
+        main_layout.setContentsMargins(20, 20, 20, 20)
+        
+        # Create tab widget
+        self.tab_widget = QTabWidget()
+        self.tab_widget.setStyleSheet("""
+            QTabWidget::pane {
+                border: none;
+            }
+            QTabBar::tab {
+                background-color: #363636;
+                color: white;
+                padding: 10px 20px;
+                border-top-left-radius: 4px;
+                border-top-right-radius: 4px;
+            }
+            QTabBar::tab:selected {
+                background-color: #0d6efd;
+            }
+            QTabBar::tab:hover:!selected {
+                background-color: #404040;
+            }
+        """)
+        
+        # Create tabs
+        self.browse_tab = QWidget()
+        self.my_wallpapers_tab = QWidget()
+        self.settings_tab = QWidget()
+        
+        # Add tabs to tab widget
+        self.tab_widget.addTab(self.browse_tab, "Browse")
+        self.tab_widget.addTab(self.my_wallpapers_tab, "My Wallpapers")
+        self.tab_widget.addTab(self.settings_tab, "Settings")
+        
+        # Setup each tab
+        self.setup_browse_tab()
+        self.setup_my_wallpapers_tab()
+        self.setup_settings_tab()
+        
+        main_layout.addWidget(self.tab_widget)
+        
+        # Background job status, only visible while jobs are queued
+        self.job_status_label = QLabel()
+        self.job_progress_bar = QProgressBar()
+        self.job_progress_bar.setMaximumWidth(200)
+        self.job_progress_bar.setTextVisible(False)
+        self.job_cancel_button = QPushButton("Cancel")
+        self.job_cancel_button.clicked.connect(self.cancel_all_jobs)
+        self.statusBar().addPermanentWidget(self.job_status_label)
+        self.statusBar().addPermanentWidget(self.job_progress_bar)
+        self.statusBar().addPermanentWidget(self.job_cancel_button)
+        self.update_job_status()
+        
+        # Connect tab change signal
+        self.tab_widget.currentChanged.connect(self.on_tab_changed)
+        
+        self.setStyleSheet("""
+            QMainWindow {
+                background-color: #2b2b2b;
+            }
+            QWidget {
+                background-color: #2b2b2b;
+                color: #ffffff;
+            }
+            QLineEdit {
+                padding: 8px;
+                border: 2px solid #3d3d3d;
+                border-radius: 4px;
+                background-color: #363636;
+                color: white;
+                font-size: 14px;
+            }
+            QPushButton {
+                padding: 8px 15px;
+                background-color: #0d6efd;
+                border: none;
+                border-radius: 4px;
+                color: white;
+                font-size: 14px;
+            }
+            QPushButton:hover {
+                background-color: #0b5ed7;
+            }
+            QPushButton:pressed {
+                background-color: #0a58ca;
+            }
+            QScrollArea {
+                border: none;
+            }
+            QLabel {
+                color: white;
+                font-size: 14px;
+            }
+        """)
+        
+        self.resize(1200, 800)
+        
+    def setup_browse_tab(self):
+        layout = QVBoxLayout(self.browse_tab)
+        layout.setSpacing(20)
+        
+        # Move existing search and filter controls here
+        search_layout = QHBoxLayout()
+        search_layout.setSpacing(10)
+        
+        self.subreddit_entry = QLineEdit()
+        self.subreddit_entry.setPlaceholderText("Enter subreddit names (comma-separated)...")
+        self.subreddit_entry.setText("wallpapers, wallpaper, widescreenwallpaper")
+        self.subreddit_entry.setMinimumHeight(40)
+        
+        search_button = QPushButton("Search")
+        search_button.setMinimumHeight(40)
+        search_button.clicked.connect(lambda: self.fetch_wallpapers(reset=True))
+        
+        search_layout.addWidget(self.subreddit_entry, stretch=4)
+        search_layout.addWidget(search_button, stretch=1)
+        
+        layout.addLayout(search_layout)
+        
+        # Add resolution layout
+        resolution_layout = QHBoxLayout()
+        resolution_layout.setSpacing(10)
+        
+        resolution_label = QLabel("Resolution:")
+        
+        # Add resolution dropdown
+        self.resolution_dropdown = QLineEdit()
+        self.resolution_dropdown.setPlaceholderText("Select or type resolution...")
+        self.resolution_dropdown.setMinimumHeight(40)
+        self.resolution_dropdown.setStyleSheet("""
+            QLineEdit {
+                padding: 8px;
+                border: 2px solid #3d3d3d;
+                border-radius: 4px;
+                background-color: #363636;
+                color: white;
+                font-size: 14px;
+            }
+        """)
+        
+        # Create resolution menu
+        self.resolution_menu = QMenu()
+        self.resolution_menu.setStyleSheet("""
+            QMenu {
+                background-color: #363636;
+                border: 1px solid #3d3d3d;
+                border-radius: 4px;
+                padding: 5px;
+            }
+            QMenu::item {
+                padding: 5px 15px;
+                color: white;
+            }
+            QMenu::item:selected {
+                background-color: #0d6efd;
+            }
+        """)
+        
+        for resolution in COMMON_RESOLUTIONS:
+            action = self.resolution_menu.addAction(resolution)
+            action.triggered.connect(lambda checked, res=resolution: self.set_resolution(res))
+        
+        # Add dropdown button
+        dropdown_button = QPushButton("▼")
+        dropdown_button.setMaximumWidth(40)
+        dropdown_button.setMinimumHeight(40)
+        dropdown_button.clicked.connect(self.show_resolution_menu)
+        
+        resolution_layout.addWidget(resolution_label)
+        resolution_layout.addWidget(self.resolution_dropdown, stretch=1)
+        resolution_layout.addWidget(dropdown_button)
+        
+        layout.addLayout(resolution_layout)
+        
+        # Add directory selection layout
+        directory_layout = QHBoxLayout()
+        directory_layout.setSpacing(10)
+        
+        directory_label = QLabel("Wallpaper Directory:")
+        self.directory_entry = QLineEdit()
+        self.directory_entry.setReadOnly(True)
+        self.directory_entry.setMinimumHeight(40)
+        self.directory_entry.setStyleSheet("""
+            QLineEdit {
+                padding: 8px;
+                border: 2px solid #3d3d3d;
+                border-radius: 4px;
+                background-color: #363636;
+                color: white;
+                font-size: 14px;
+            }
+        """)
+        
+        browse_button = QPushButton("Browse")
+        browse_button.setMinimumHeight(40)
+        browse_button.clicked.connect(self.select_wallpaper_directory)
+        
+        directory_layout.addWidget(directory_label)
+        directory_layout.addWidget(self.directory_entry, stretch=1)
+        directory_layout.addWidget(browse_button)
+        
+        layout.addLayout(directory_layout)
+        
+        # Add image grid, only the visible cards are ever painted
+        self.browse_model = WallpaperListModel(parent=self)
+        self.browse_model.thumbnail_needed.connect(lambda key: self.request_thumbnail('browse', key))
+        self.browse_view = self.create_wallpaper_view(self.browse_model)
+        # More wallpapers are loaded as the grid is scrolled
+        self.browse_view.verticalScrollBar().valueChanged.connect(self.update_feed_target)
+        layout.addWidget(self.browse_view)
+        
+        # Add loading spinner
+        self.loading_spinner = LoadingSpinner(self)
+        self.loading_spinner.setFixedSize(100, 100)
+        
+        # Center the spinner in the window
+        def center_spinner():
+            geometry = self.geometry()
+            self.loading_spinner.move(
+                geometry.width()//2 - self.loading_spinner.width()//2,
+                geometry.height()//2 - self.loading_spinner.height()//2
+            )
+        
+        def on_resize(event):
+            center_spinner()
+            # A taller window shows more cards
+            self.update_feed_target()
+        
+        self.resizeEvent = on_resize
+        
+    def setup_my_wallpapers_tab(self):
+        layout = QVBoxLayout(self.my_wallpapers_tab)
+        
+        self.local_model = WallpaperListModel(parent=self)
+        self.local_model.thumbnail_needed.connect(lambda key: self.request_thumbnail('local', key))
+        self.local_view = self.create_wallpaper_view(self.local_model)
+        layout.addWidget(self.local_view)
+
+    def create_wallpaper_view(self, model):
+        view = QListView()
+        view.setViewMode(QListView.ViewMode.IconMode)
+        view.setResizeMode(QListView.ResizeMode.Adjust)
+        view.setMovement(QListView.Movement.Static)
+        view.setUniformItemSizes(True)
+        view.setSpacing(10)
+        view.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        view.setMouseTracking(True)
+        view.viewport().setAttribute(Qt.WidgetAttribute.WA_Hover)
+        view.setStyleSheet("QListView { border: none; }")
+        
+        delegate = WallpaperCardDelegate(view)
+        delegate.set_wallpaper_clicked.connect(self.set_wallpaper)
+        delegate.download_clicked.connect(self.download_wallpaper)
+        view.setItemDelegate(delegate)
+        view.setModel(model)
+        return view
+
+    def setup_settings_tab(self):
+        # Scrolls, with the metrics panel it is taller than many screens
+        scroll_area = QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setFrameShape(QFrame.Shape.NoFrame)
+        settings_content = QWidget()
+        scroll_area.setWidget(settings_content)
+        tab_layout = QVBoxLayout(self.settings_tab)
+        tab_layout.setContentsMargins(0, 0, 0, 0)
+        tab_layout.addWidget(scroll_area)
+        
+        layout = QVBoxLayout(settings_content)
+        layout.setSpacing(20)
+        layout.setContentsMargins(40, 40, 40, 40)
+        
+        # Title
+        title_label = QLabel("Settings")
+        title_label.setStyleSheet("""
+            QLabel {
+                font-size: 24px;
+                font-weight: bold;
+                margin-bottom: 20px;
+            }
+        """)
+        layout.addWidget(title_label)
+        
+        # Theme selection
+        theme_group = QGroupBox("Theme")
+        theme_group.setStyleSheet("""
+            QGroupBox {
+                font-size: 16px;
+                border: 2px solid #3d3d3d;
+                border-radius: 8px;
+                padding: 15px;
+                margin-top: 15px;
+            }
+            QGroupBox::title {
+                subcontrol-origin: margin;
+                left: 20px;
+                padding: 0 5px;
+            }
+            QRadioButton {
+                font-size: 14px;
+                padding: 5px;
+                spacing: 10px;
+            }
+            QRadioButton::indicator {
+                width: 18px;
+                height: 18px;
+            }
+        """)
+        
+        theme_layout = QVBoxLayout()
+        theme_layout.setSpacing(10)
+        theme_layout.setContentsMargins(20, 20, 20, 20)
+        
+        self.dark_theme = QRadioButton("Dark Theme")
+        self.light_theme = QRadioButton("Light Theme")
+        current_theme = self.settings.value('theme', 'dark')
+        if current_theme == 'dark':
+            self.dark_theme.setChecked(True)
+        else:
+            self.light_theme.setChecked(True)
+        
+        theme_layout.addWidget(self.dark_theme)
+        theme_layout.addWidget(self.light_theme)
+        theme_group.setLayout(theme_layout)
+        
+        # Default subreddits
+        subreddits_group = QGroupBox("Default Subreddits")
+        subreddits_group.setStyleSheet("""
+            QGroupBox {
+                font-size: 16px;
+                border: 2px solid #3d3d3d;
+                border-radius: 8px;
+                padding: 15px;
+                margin-top: 15px;
+            }
+            QGroupBox::title {
+                subcontrol-origin: margin;
+                left: 20px;
+                padding: 0 5px;
+            }
+            QLineEdit {
+                padding: 10px;
+                font-size: 14px;
+                border: 2px solid #3d3d3d;
+                border-radius: 6px;
+                background-color: #363636;
+            }
+        """)
+        
+        subreddits_layout = QVBoxLayout()
+        subreddits_layout.setSpacing(10)
+        subreddits_layout.setContentsMargins(20, 20, 20, 20)
+        
+        subreddits_label = QLabel("Enter comma-separated subreddit names:")
+        subreddits_label.setStyleSheet("font-size: 14px;")
+        
+        self.default_subreddits = QLineEdit()
+        self.default_subreddits.setText(self.settings.value('default_subreddits', 
+            'wallpapers, wallpaper, widescreenwallpaper'))
+        self.default_subreddits.setMinimumHeight(40)
+        
+        subreddits_layout.addWidget(subreddits_label)
+        subreddits_layout.addWidget(self.default_subreddits)
+        subreddits_group.setLayout(subreddits_layout)
+        
+        # Performance options
+        performance_group = QGroupBox("Performance")
+        performance_group.setStyleSheet("""
+            QGroupBox {
+                font-size: 16px;
+                border: 2px solid #3d3d3d;
+                border-radius: 8px;
+                padding: 15px;
+                margin-top: 15px;
+            }
+            QGroupBox::title {
+                subcontrol-origin: margin;
+                left: 20px;
+                padding: 0 5px;
+            }
+            QSpinBox {
+                padding: 8px;
+                font-size: 14px;
+                border: 2px solid #3d3d3d;
+                border-radius: 6px;
+                background-color: #363636;
+            }
+            QCheckBox {
+                font-size: 14px;
+                padding: 5px;
+                spacing: 10px;
+            }
+            QComboBox {
+                padding: 8px;
+                font-size: 14px;
+                border: 2px solid #3d3d3d;
+                border-radius: 6px;
+                background-color: #363636;
+            }
+        """)
+        
+        performance_layout = QVBoxLayout()
+        performance_layout.setSpacing(10)
+        performance_layout.setContentsMargins(20, 20, 20, 20)
+        
+        workers_label = QLabel("Parallel image downloads:")
+        workers_label.setStyleSheet("font-size: 14px;")
+        
+        self.download_workers_spin = QSpinBox()
+        self.download_workers_spin.setRange(1, MAX_DOWNLOAD_WORKERS)
+        self.download_workers_spin.setValue(self.download_workers)
+        self.download_workers_spin.setMinimumHeight(40)
+        
+        cards_ahead_label = QLabel("Wallpapers to load ahead while scrolling:")
+        cards_ahead_label.setStyleSheet("font-size: 14px;")
+        
+        self.cards_ahead_spin = QSpinBox()
+        self.cards_ahead_spin.setRange(IMAGES_PER_PAGE, MAX_CARDS_AHEAD)
+        self.cards_ahead_spin.setValue(self.cards_ahead)
+        self.cards_ahead_spin.setMinimumHeight(40)
+        
+        self.use_previews_checkbox = QCheckBox("Use Reddit previews for thumbnails (much less data)")
+        self.use_previews_checkbox.setChecked(self.thumbnail_source == 'preview')
+        
+        engine_label = QLabel("Fetch engine:")
+        engine_label.setStyleSheet("font-size: 14px;")
+        
+        self.fetch_engine_combo = QComboBox()
+        self.fetch_engine_combo.addItem("Threads", 'thread')
+        self.fetch_engine_combo.addItem("asyncio (needs aiohttp)", 'asyncio')
+        self.fetch_engine_combo.setCurrentIndex(max(self.fetch_engine_combo.findData(self.fetch_engine_name), 0))
+        self.fetch_engine_combo.setMinimumHeight(40)
+        
+        performance_layout.addWidget(workers_label)
+        performance_layout.addWidget(self.download_workers_spin)
+        performance_layout.addWidget(engine_label)
+        performance_layout.addWidget(self.fetch_engine_combo)
+        performance_layout.addWidget(cards_ahead_label)
+        performance_layout.addWidget(self.cards_ahead_spin)
+        performance_layout.addWidget(self.use_previews_checkbox)
+        performance_group.setLayout(performance_layout)
+        
+        # Live timings and counters of the hot paths (see metrics.py)
+        metrics_group = QGroupBox("Metrics")
+        metrics_group.setStyleSheet("""
+            QGroupBox {
+                font-size: 16px;
+                border: 2px solid #3d3d3d;
+                border-radius: 8px;
+                padding: 15px;
+                margin-top: 15px;
+            }
+            QGroupBox::title {
+                subcontrol-origin: margin;
+                left: 20px;
+                padding: 0 5px;
+            }
+            QTableWidget {
+                font-size: 13px;
+                border: 2px solid #3d3d3d;
+                border-radius: 6px;
+            }
+            QPushButton {
+                padding: 8px;
+                font-size: 14px;
+                border-radius: 6px;
+            }
+        """)
+        
+        metrics_layout = QVBoxLayout()
+        metrics_layout.setSpacing(10)
+        metrics_layout.setContentsMargins(20, 20, 20, 20)
+        
+        self.metrics_table = QTableWidget(0, 6)
+        self.metrics_table.setHorizontalHeaderLabels(["Metric", "Count", "Mean ms", "p95 ms", "Max ms", "Total ms"])
+        self.metrics_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.metrics_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.metrics_table.verticalHeader().setVisible(False)
+        self.metrics_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.metrics_table.setMinimumHeight(180)
+        
+        metrics_buttons = QHBoxLayout()
+        export_metrics_button = QPushButton("Export...")
+        export_metrics_button.clicked.connect(self.export_metrics)
+        reset_metrics_button = QPushButton("Reset")
+        reset_metrics_button.clicked.connect(self.reset_metrics)
+        metrics_buttons.addStretch()
+        metrics_buttons.addWidget(export_metrics_button)
+        metrics_buttons.addWidget(reset_metrics_button)
+        
+        metrics_layout.addWidget(self.metrics_table)
+        metrics_layout.addLayout(metrics_buttons)
+        metrics_group.setLayout(metrics_layout)
+        
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.setInterval(1000)
+        self.metrics_timer.timeout.connect(self.refresh_metrics)
+        
+        # Save button with better styling
+        save_button = QPushButton("Save Changes")
+        save_button.setMinimumHeight(50)
+        save_button.setStyleSheet("""
+            QPushButton {
+                background-color: #28a745;
+                border-radius: 6px;
+                font-size: 16px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #218838;
+            }
+            QPushButton:pressed {
+                background-color: #1e7e34;
+            }
+        """)
+        save_button.clicked.connect(self.save_settings)
+        
+        # Add everything to main layout
+        layout.addWidget(theme_group)
+        layout.addWidget(subreddits_group)
+        layout.addWidget(performance_group)
+        layout.addWidget(metrics_group)
+        layout.addSpacing(20)
+        layout.addWidget(save_button)
+        layout.addStretch()
+        
+        # Add a reset button
+        reset_button = QPushButton("Reset to Defaults")
+        reset_button.setStyleSheet("""
+            QPushButton {
+                background-color: #6c757d;
+                border-radius: 6px;
+                font-size: 14px;
+                padding: 10px;
+            }
+            QPushButton:hover {
+                background-color: #5a6268;
+            }
+            QPushButton:pressed {
+                background-color: #545b62;
+            }
+        """)
+        reset_button.clicked.connect(self.reset_settings)
+        layout.addWidget(reset_button)
+
+    def refresh_metrics(self):
+        # Spans first (times in ms), then counters with just a count
+        snapshot = METRICS.snapshot()
+        rows = [
+            (name, span['count'], span['mean_ms'], span['p95_ms'], span['max_ms'], span['total_ms'])
+            for name, span in snapshot['spans'].items()
+        ]
+        rows += [(name, value, None, None, None, None) for name, value in snapshot['counters'].items()]
+        
+        self.metrics_table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                if value is None:
+                    text = ""
+                elif isinstance(value, float):
+                    text = f"{value:.1f}"
+                else:
+                    text = str(value)
+                item = QTableWidgetItem(text)
+                if column:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.metrics_table.setItem(row, column, item)
+
+    def export_metrics(self):
+        save_path, selected_filter = QFileDialog.getSaveFileName(
+            self,
+            "Export Metrics",
+            os.path.join(os.path.expanduser('~'), 'wallpaper-metrics.json'),
+            'JSON Files (*.json);;CSV Files (*.csv)'
+        )
+        if not save_path:
+            return
+        if selected_filter.startswith('CSV') and not save_path.lower().endswith('.csv'):
+            save_path += '.csv'
+        try:
+            METRICS.export(save_path)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Could not export metrics: {e}")
+
+    def reset_metrics(self):
+        METRICS.reset()
+        self.refresh_metrics()
+
+    def process_image(self, image_url, thumbnail_url=None, dimensions=None):
+        return wallpaper_core.process_image(self.http, self.thumbnail_cache, image_url, thumbnail_url, dimensions)
+
+    def fetch_wallpapers(self, reset=False, resolution=None):
+        # resolution: switch the running search to this filter first (see
+        # refilter_wallpapers)
+        if reset:
+            self.current_images.clear()
+            self.search = None
+            self.session_images = []
+            self.browse_model.clear()
+        
+        # Stop any search that is still downloading in the background
+        if self.fetch_cancel_event:
+            self.fetch_cancel_event.set()
+        self.fetch_cancel_event = Event()
+        previous_feed = self.feed
+        self.feed = None
+        
+        # Read the inputs here, widgets must not be touched from the worker thread
+        if self.search is None:
+            subreddit_names = [s.strip() for s in self.subreddit_entry.text().split(',')]
+            try:
+                self.search = WallpaperSearch(
+                    self.fetch_engine,
+                    subreddit_names,
+                    self.resolution_dropdown.text(),
+                    index=self.wallpaper_index,
+                    listing_cache=self.listing_cache
+                )
+                self.resolution_filter = self.search.desired_resolution
+            except ValueError:
+                # Not a resolution we understand
+                self.loading_spinner.stop()
+                return
+        
+        self.loading_spinner.start()
+        self.feed = {
+            'search': self.search,
+            'target': 0,
+            'wanted': Condition(),
+            'finished': Event(),
+            'resolution': resolution
+        }
+        self.update_feed_target()
+        # A feed continuing the same search waits for the old one to let go of it
+        if previous_feed and previous_feed['search'] is self.search:
+            previous_finished = previous_feed['finished']
+        else:
+            previous_finished = None
+        Thread(
+            target=self._feed_wallpapers_thread,
+            args=(self.feed, self.thumbnail_source, len(self.current_images), self.fetch_cancel_event,
+                  previous_finished),
+            daemon=True
+        ).start()
+
+    def _feed_wallpapers_thread(self, feed, thumbnail_source, start_position, cancel_event, previous_finished):
+        # Producer side of the infinite scroll: a page is fetched whenever
+        # fewer than feed['target'] cards are loaded, otherwise the thread
+        # waits for the user to scroll. Downloads follow the scroll rate and
+        # at most a page more than cards_ahead is ever held.
+        task = ThumbnailTask(self.thumbnail_cache, thumbnail_source)
+        search = feed['search']
+        delivered = start_position
+        
+        def on_result(post_data, processed_data, index):
+            self.image_loaded.emit({
+                'url': post_data['url'],
+                'title': post_data['title'],
+                'subreddit': post_data['subreddit_display'],
+                'thumbnail_source': post_data['thumbnail_source'],
+                'width': processed_data['width'],
+                'height': processed_data['height'],
+                'search': search,
+                'processed_data': processed_data
+            })
+        
+        try:
+            if previous_finished:
+                # A cancelled feed lets go within a download, but this one may be
+                # replaced in the meantime as well
+                while not previous_finished.wait(0.5):
+                    if cancel_event.is_set():
+                        return
+            if feed['resolution'] is not None:
+                search.set_resolution(feed['resolution'])
+            while search.has_more() and not cancel_event.is_set():
+                with feed['wanted']:
+                    while delivered >= feed['target'] and not cancel_event.is_set():
+                        # Scrolling wakes this up, the timeout only notices a cancel
+                        feed['wanted'].wait(0.5)
+                if cancel_event.is_set():
+                    break
+                delivered += search.fetch_page(task, on_result, cancel_event)
+                self.page_loaded.emit()
+        except ListingUnavailable as e:
+            if not cancel_event.is_set():
+                self.feed_failed.emit(str(e))
+        except Exception as e:
+            # E.g. the engine closed under a cancelled feed
+            if not cancel_event.is_set():
+                print(f"Error in fetch thread: {e}")
+        finally:
+            feed['finished'].set()
+        
+        # A newer search owns the spinner now
+        if not cancel_event.is_set():
+            self.loading_finished.emit()
+
+    def update_feed_target(self):
+        # Ask the feed for cards_ahead cards past the last visible one
+        feed = self.feed
+        if not feed:
+            return
+        with feed['wanted']:
+            feed['target'] = self.visible_card_count() + self.cards_ahead
+            feed['wanted'].notify()
+
+    def visible_card_count(self):
+        # Cards up to the bottom of the viewport. Rows are laid out in order,
+        # so binary search for the first one starting below it.
+        view = self.browse_view
+        bottom = view.viewport().height()
+        low, high = 0, self.browse_model.rowCount()
+        while low < high:
+            middle = (low + high) // 2
+            if view.visualRect(self.browse_model.index(middle)).top() < bottom:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def add_image_to_grid(self, image_data):
+        # Late results of a search that has been replaced are dropped
+        if image_data['search'] is not self.search:
+            return
+        self.session_images.append({key: value for key, value in image_data.items() if key != 'processed_data'})
+        # ... and ones the filter was changed under are only kept for later
+        if self.resolution_filter and not matches_resolution(image_data['width'], image_data['height'],
+                                                             *self.resolution_filter):
+            return
+        self.show_search_result(image_data, image_data['processed_data'])
+
+    def show_search_result(self, image_data, processed_data):
+        with METRICS.span('card.create'):
+            self._show_search_result(image_data, processed_data)
+
+    def _show_search_result(self, image_data, processed_data):
+        # Results arrive in position order, so appending keeps the grid stable
+        self.browse_model.append_item({
+            'key': image_data['url'],
+            'url': image_data['url'],
+            'title': image_data['title'],
+            'subreddit': image_data['subreddit'],
+            'thumbnail_source': image_data['thumbnail_source']
+        }, processed_data)
+        self.current_images.append({
+            'url': image_data['url'],
+            'title': image_data['title'],
+            'subreddit': image_data['subreddit']
+        })
+
+    def request_thumbnail(self, target, key):
+        # A card scrolled into view without a pixmap, usually because it was
+        # evicted from the model's LRU. The disk cache normally answers this.
+        if target == 'browse':
+            item = self.browse_model.item(key)
+            if item is None:
+                return
+            self.thumbnail_executor.submit(
+                self._thumbnail_worker, target, key,
+                self.process_image, item['url'], *item['thumbnail_source']
+            )
+        else:
+            self.thumbnail_executor.submit(self._thumbnail_worker, target, key, self.process_local_image, key)
+
+    def _thumbnail_worker(self, target, key, process, *args):
+        self.thumbnail_ready.emit({
+            'target': target,
+            'key': key,
+            'processed_data': process(*args)
+        })
+
+    def on_thumbnail_ready(self, result):
+        model = self.browse_model if result['target'] == 'browse' else self.local_model
+        model.set_thumbnail(result['key'], result['processed_data'])
+
+    def on_page_loaded(self):
+        self.loading_spinner.stop()
+        # The new cards may not fill the viewport yet
+        self.update_feed_target()
+
+    def on_loading_finished(self):
+        self.loading_spinner.stop()
+
+    def set_wallpaper(self, url_or_path):
+        self.queue_job('set', url_or_path)
+
+    def _prepare_wallpaper_file(self, url_or_path, job):
+        # Check if this is a local file or URL
+        if url_or_path.startswith(('http://', 'https://')):
+            # Save to wallpaper directory, reusing an identical image if we have one
+            wallpaper_path = self.wallpaper_store.fetch(
+                url_or_path,
+                progress_callback=lambda received, total: self.job_progress.emit(job['id'], received, total or -1),
+                cancel_event=job['cancel_event']
+            )
+        else:
+            # Handle local file
+            wallpaper_path = url_or_path
+            if not os.path.exists(wallpaper_path):
+                raise Exception(f"File not found: {wallpaper_path}")
+        
+        return os.path.abspath(wallpaper_path)
+
+    def apply_wallpaper(self, abs_path):
+        # Runs on a job worker thread. Returns a warning when the wallpaper
+        # could not be applied but the image is still usable, raises on errors.
+        if self.os_name == "Darwin":
+            abs_path = abs_path.replace('\\', '/')
+            
+            script = f'''
+                tell application "System Events"
+                    tell every desktop
+                        set picture to "{abs_path}"
+                    end tell
+                end tell
+                '''
+            
+            try:
+                os.chmod(abs_path, 0o644)
+                
+                result = subprocess.run(
+                    ['osascript', '-e', script],
+                    capture_output=True,
+                    text=True
+                )
+                
+                if result.returncode != 0:
+                    alternative_script = f'''
+                        tell application "Finder"
+                            set desktop picture to POSIX file "{abs_path}"
+                        end tell
+                        '''
+                    result = subprocess.run(
+                        ['osascript', '-e', alternative_script],
+                        capture_output=True,
+                        text=True
+                    )
+                    
+                    if result.returncode != 0:
+                        final_script = f'''
+                            tell application "System Events"
+                                set picture of current desktop to "{abs_path}"
+                            end tell
+                            '''
+                        subprocess.run(
+                            ['osascript', '-e', final_script],
+                            check=True,
+                            capture_output=True,
+                            text=True
+                        )
+                
+            except subprocess.CalledProcessError as e:
+                raise Exception(f"AppleScript error: {e.stderr}\nCommand output: {e.stdout}")
+            
+        elif self.os_name == "Windows":
+            SPI_SETDESKWALLPAPER = 0x0014
+            SPIF_UPDATEINIFILE = 0x01
+            SPIF_SENDCHANGE = 0x02
+            if not ctypes.windll.user32.SystemParametersInfoW(
+                SPI_SETDESKWALLPAPER, 
+                0, 
+                abs_path, 
+                SPIF_UPDATEINIFILE | SPIF_SENDCHANGE
+            ):
+                raise Exception(f"SystemParametersInfoW failed: {ctypes.get_last_error()}")
+        
+        elif self.os_name == "Linux":
+            desktop = os.environ.get('XDG_CURRENT_DESKTOP', '').lower()
+            if 'gnome' in desktop or 'unity' in desktop:
+                subprocess.run([
+                    'gsettings', 
+                    'set', 
+                    'org.gnome.desktop.background', 
+                    'picture-uri-dark' if 'dark' in desktop else 'picture-uri',
+                    f'file://{abs_path}'
+                ], check=True)
+            elif 'kde' in desktop:
+                subprocess.run(['plasma-apply-wallpaperimage', abs_path], check=True)
+            elif 'xfce' in desktop:
+                subprocess.run([
+                    'xfconf-query', 
+                    '-c', 'xfce4-desktop', 
+                    '-p', '/backdrop/screen0/monitor0/workspace0/last-image', 
+                    '-s', abs_path
+                ], check=True)
+            elif 'mate' in desktop:
+                subprocess.run([
+                    'gsettings', 
+                    'set', 
+                    'org.mate.background', 
+                    'picture-filename', 
+                    abs_path
+                ], check=True)
+            else:
+                return (
+                    f"Unsupported Linux desktop environment: {desktop}\n"
+                    "The image has been saved to: " + abs_path
+                )
+        
+        return None
+
+    def download_wallpaper(self, url, title):
+        clean_title = "".join(x for x in title if x.isalnum() or x in (' ', '-', '_'))
+        clean_title = clean_title[:50]
+        
+        file_types = 'JPEG Files (*.jpg);;PNG Files (*.png);;All Files (*)'
+        initial_path = os.path.join(self.wallpaper_directory, f"{clean_title}.jpg")
+        save_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Save Wallpaper",
+            initial_path,
+            file_types
+        )
+        
+        if save_path:
+            self.queue_job('download', url, save_path)
+
+    def queue_job(self, kind, url_or_path, save_path=None):
+        job = {
+            'id': uuid.uuid4().hex[:8],
+            'kind': kind,
+            'url': url_or_path,
+            'save_path': save_path,
+            'cancel_event': Event()
+        }
+        self.jobs[job['id']] = job
+        self.job_queue.put(job)
+        self.update_job_status()
+        return job['id']
+
+    def cancel_job(self, job_id):
+        job = self.jobs.get(job_id)
+        if job:
+            job['cancel_event'].set()
+
+    def cancel_all_jobs(self):
+        for job_id in list(self.jobs):
+            self.cancel_job(job_id)
+
+    def closeEvent(self, event):
+        # Queued thumbnails would only hit the process pool while it shuts down
+        if self.fetch_cancel_event:
+            self.fetch_cancel_event.set()
+        self.thumbnail_executor.shutdown(wait=False, cancel_futures=True)
+        super().closeEvent(event)
+
+    def _job_worker(self):
+        while True:
+            job = self.job_queue.get()
+            try:
+                if job['cancel_event'].is_set():
+                    raise DownloadCancelled(job['url'])
+                if job['kind'] == 'set':
+                    self._run_set_job(job)
+                else:
+                    self.http.download(
+                        job['url'],
+                        job['save_path'],
+                        progress_callback=lambda received, total: self.job_progress.emit(job['id'], received, total or -1),
+                        cancel_event=job['cancel_event']
+                    )
+                    self.job_finished.emit(job['id'], 'info', "Image downloaded successfully!")
+            except DownloadCancelled:
+                self.job_cancelled.emit(job['id'])
+            except Exception as e:
+                self.job_failed.emit(job['id'], f"Error downloading image: {str(e)}")
+            finally:
+                self.job_queue.task_done()
+
+    def _run_set_job(self, job):
+        with METRICS.span('wallpaper.set'):
+            self._set_wallpaper_job(job)
+
+    def _set_wallpaper_job(self, job):
+        abs_path = None
+        try:
+            abs_path = self._prepare_wallpaper_file(job['url'], job)
+            if job['cancel_event'].is_set():
+                raise DownloadCancelled(job['url'])
+            
+            # Desktop settings are applied one at a time
+            with self.apply_lock, METRICS.span('wallpaper.apply'):
+                warning = self.apply_wallpaper(abs_path)
+            if warning:
+                self.job_finished.emit(job['id'], 'warning', warning)
+            else:
+                self.job_finished.emit(job['id'], 'info', "Wallpaper set successfully!")
+        
+        except DownloadCancelled:
+            raise
+        except Exception as e:
+            error_msg = str(e)
+            if self.os_name == "Windows":
+                error_code = ctypes.get_last_error()
+                error_msg += f"\nWindows Error Code: {error_code}"
+            
+            self.job_failed.emit(
+                job['id'],
+                f"Error setting wallpaper: {error_msg}\n"
+                f"OS: {self.os_name}\n"
+                f"File path: {abs_path or 'Not created'}"
+            )
+
+    def on_job_progress(self, job_id, received, total):
+        if job_id not in self.jobs:
+            return
+        if total > 0:
+            self.job_progress_bar.setRange(0, total)
+            self.job_progress_bar.setValue(received)
+        else:
+            # Unknown size, show a busy indicator
+            self.job_progress_bar.setRange(0, 0)
+
+    def on_job_finished(self, job_id, level, message):
+        self.jobs.pop(job_id, None)
+        self.update_job_status()
+        if level == 'warning':
+            QMessageBox.warning(self, "Warning", message)
+        else:
+            QMessageBox.information(self, "Success", message)
+
+    def on_job_failed(self, job_id, message):
+        self.jobs.pop(job_id, None)
+        self.update_job_status()
+        QMessageBox.critical(self, "Error", message)
+
+    def on_job_cancelled(self, job_id):
+        self.jobs.pop(job_id, None)
+        self.update_job_status()
+
+    def update_job_status(self):
+        count = len(self.jobs)
+        if count:
+            self.job_status_label.setText(f"{count} wallpaper job{'s' if count != 1 else ''} in progress")
+        self.job_status_label.setVisible(bool(count))
+        self.job_progress_bar.setVisible(bool(count))
+        self.job_cancel_button.setVisible(bool(count))
+        if not count:
+            self.job_progress_bar.reset()
+
+    def show_resolution_menu(self):
+        # Position the menu under the dropdown
+        pos = self.resolution_dropdown.mapToGlobal(self.resolution_dropdown.rect().bottomLeft())
+        self.resolution_menu.popup(pos)
+
+    def set_resolution(self, resolution):
+        if resolution == "All Resolutions":
+            self.resolution_dropdown.clear()
+        else:
+            # Extract just the resolution part before the parentheses
+            res = resolution.split(" ")[0]
+            self.resolution_dropdown.setText(res)
+        
+        subreddit_names = [s.strip() for s in self.subreddit_entry.text().split(',')]
+        if self.search and self.search.subreddit_names == [name for name in subreddit_names if name]:
+            self.refilter_wallpapers(self.resolution_dropdown.text())
+        else:
+            self.clear_grid()
+            self.fetch_wallpapers(reset=True)
+
+    def refilter_wallpapers(self, resolution):
+        # Same subreddits, different filter: everything already found is
+        # filtered in memory and shown at once (thumbnails come from the
+        # disk cache as cards scroll into view), and the search carries on
+        # with the posts it hasn't delivered yet before fetching anything new
+        try:
+            self.resolution_filter = parse_resolution(resolution)
+        except ValueError:
+            return
+        self.clear_grid()
+        for image_data in self.session_images:
+            if not self.resolution_filter or matches_resolution(image_data['width'], image_data['height'],
+                                                                 *self.resolution_filter):
+                self.show_search_result(image_data, None)
+        self.fetch_wallpapers(resolution=resolution)
+
+    def load_settings(self):
+        self.wallpaper_directory = self.settings.value(
+            'wallpaper_directory',
+            DEFAULT_WALLPAPER_DIR
+        )
+        # Create directory if it doesn't exist
+        os.makedirs(self.wallpaper_directory, exist_ok=True)
+        self.download_workers = int(self.settings.value('download_workers', DEFAULT_DOWNLOAD_WORKERS))
+        self.thumbnail_source = self.settings.value('thumbnail_source', 'preview')
+        self.fetch_engine_name = self.settings.value('fetch_engine', 'thread')
+        self.cards_ahead = int(self.settings.value('cards_ahead', DEFAULT_CARDS_AHEAD))
+
+    def create_fetch_engine(self):
+        try:
+            return create_fetch_engine(self.fetch_engine_name, self.http, self.download_workers)
+        except RuntimeError as e:
+            print(f"Error starting fetch engine: {e}")
+            self.fetch_engine_name = 'thread'
+            return create_fetch_engine('thread', self.http, self.download_workers)
+
+    def set_fetch_engine(self, name):
+        if name == self.fetch_engine_name:
+            if self.fetch_engine.name == 'thread':
+                self.fetch_engine.workers = self.download_workers
+                return
+            # The asyncio engine's limits are set when it starts, a new
+            # download count takes a new engine
+            if self.fetch_engine.concurrency == self.download_workers:
+                return
+        
+        # Stop the feed, its engine is closed once it has let go
+        if self.fetch_cancel_event:
+            self.fetch_cancel_event.set()
+        Thread(
+            target=self._close_fetch_engine,
+            args=(self.fetch_engine, self.feed['finished'] if self.feed else None),
+            daemon=True
+        ).start()
+        self.fetch_engine_name = name
+        self.fetch_engine = self.create_fetch_engine()
+        if self.fetch_engine_name != name:
+            QMessageBox.warning(self, "Warning", "The asyncio engine needs aiohttp (pip install aiohttp), using threads.")
+            self.fetch_engine_combo.setCurrentIndex(self.fetch_engine_combo.findData('thread'))
+        self.settings.setValue('fetch_engine', self.fetch_engine_name)
+        
+        # The current search carries on with the new engine
+        if self.search:
+            self.search.engine = self.fetch_engine
+            self.fetch_wallpapers(reset=False)
+
+    def _close_fetch_engine(self, engine, feed_finished):
+        if feed_finished:
+            feed_finished.wait()
+        engine.close()
+
+    def http_pool_size(self):
+        # Every thread sharing the session: image workers, room for the
+        # parallel listing requests, thumbnails and Set as Wallpaper / Download
+        return self.download_workers + 4 + THUMBNAIL_WORKERS + JOB_WORKERS
+
+    def select_wallpaper_directory(self):
+        directory = QFileDialog.getExistingDirectory(
+            self,
+            "Select Wallpaper Directory",
+            self.wallpaper_directory,
+            QFileDialog.Option.ShowDirsOnly
+        )
+        
+        if directory:
+            self.wallpaper_directory = directory
+            self.settings.setValue('wallpaper_directory', directory)
+            self.directory_entry.setText(directory)
+            # Create directory if it doesn't exist
+            os.makedirs(directory, exist_ok=True)
+            self.wallpaper_store = WallpaperStore(directory, self.http, self.wallpaper_index)
+
+    def show_my_wallpapers(self):
+        self.clear_grid()
+        self.load_local_wallpapers()
+
+    def load_local_wallpapers(self):
+        # Rows come from the index straight away, then the directory is
+        # rescanned in the background and the rows updated if it changed
+        directory = self.wallpaper_directory
+        self.show_local_files(directory)
+        Thread(target=self._scan_wallpaper_directory, args=(directory,), daemon=True).start()
+
+    def _scan_wallpaper_directory(self, directory):
+        try:
+            files = {}
+            for entry in os.scandir(directory):
+                if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+            changed = self.wallpaper_index.sync_directory(directory, files)
+        except Exception as e:
+            self.local_scan_failed.emit(str(e))
+            return
+        if changed:
+            self.local_files_changed.emit(directory)
+
+    def show_local_files(self, directory):
+        # The indexed files are diffed against the rows already shown, and
+        # thumbnails are only made for rows that scroll into view
+        if directory != self.wallpaper_directory:
+            return
+        files = self.wallpaper_index.list_files(directory)
+        
+        # A changed file gets a fresh row so its thumbnail is rebuilt
+        shown = {item['key']: item['stats'] for item in self.local_model.items}
+        changed = [path for path, info in files.items() if path in shown and shown[path] != info['stats']]
+        if changed:
+            self.local_model.sync_items([item for item in self.local_model.items if item['key'] not in changed])
+        
+        self.local_model.sync_items([
+            self.local_model.item(path) or {
+                'key': path,
+                'url': path,
+                'title': os.path.basename(path),
+                'subreddit': None,
+                'stats': files[path]['stats'],
+                'width': files[path]['width'],
+                'height': files[path]['height']
+            }
+            for path in sorted(files)
+        ])
+
+    def process_local_image(self, file_path):
+        processed_data = wallpaper_core.process_local_image(self.thumbnail_cache, file_path)
+        if processed_data:
+            # Saves decoding the file again to list it by size
+            self.wallpaper_index.set_file_dimensions(file_path, processed_data['width'], processed_data['height'])
+        return processed_data
+
+    def apply_theme(self, theme):
+        if theme == 'dark':
+            self.setStyleSheet(self.get_dark_theme())
+        else:
+            self.setStyleSheet(self.get_light_theme())
+
+    def get_dark_theme(self):
+        return """
+            QMainWindow {
+                background-color: #2b2b2b;
+            }
+            QWidget {
+                background-color: #2b2b2b;
+                color: #ffffff;
+            }
+            QLineEdit {
+                padding: 8px;
+                border: 2px solid #3d3d3d;
+                border-radius: 4px;
+                background-color: #363636;
+                color: white;
+                font-size: 14px;
+            }
+            QPushButton {
+                padding: 8px 15px;
+                background-color: #0d6efd;
+                border: none;
+                border-radius: 4px;
+                color: white;
+                font-size: 14px;
+            }
+            QPushButton:hover {
+                background-color: #0b5ed7;
+            }
+            QPushButton:pressed {
+                background-color: #0a58ca;
+            }
+            QScrollArea {
+                border: none;
+            }
+            QLabel {
+                color: white;
+                font-size: 14px;
+            }
+        """
+
+    def get_light_theme(self):
+        return """
+            QMainWindow {
+                background-color: #f0f0f0;
+            }
+            QWidget {
+                background-color: #f0f0f0;
+                color: #000000;
+            }
+            QLineEdit {
+                padding: 8px;
+                border: 2px solid #d0d0d0;
+                border-radius: 4px;
+                background-color: #ffffff;
+                color: #000000;
+                font-size: 14px;
+            }
+            QPushButton {
+                padding: 8px 15px;
+                background-color: #0d6efd;
+                border: none;
+                border-radius: 4px;
+                color: white;
+                font-size: 14px;
+            }
+            QPushButton:hover {
+                background-color: #0b5ed7;
+            }
+            QPushButton:pressed {
+                background-color: #0a58ca;
+            }
+            QScrollArea {
+                border: none;
+            }
+            QLabel {
+                color: #000000;
+                font-size: 14px;
+            }
+        """
+
+    def show_settings_dialog(self):
+        dialog = SettingsDialog(self)
+        dialog.exec()
+        # After dialog closes, update the subreddit entry with default subreddits
+        default_subreddits = self.settings.value('default_subreddits', 
+            'wallpapers, wallpaper, widescreenwallpaper')
+        self.subreddit_entry.setText(default_subreddits)
+
+    def clear_grid(self):
+        # Clear the grid
+        self.browse_model.clear()
+        # Reset current images
+        self.current_images.clear()
+
+    def on_tab_changed(self, index):
+        if index == 1:  # My Wallpapers tab
+            self.load_local_wallpapers()
+        # The metrics panel only refreshes while it can be seen
+        if index == 2:
+            self.refresh_metrics()
+            self.metrics_timer.start()
+        else:
+            self.metrics_timer.stop()
+
+    def save_settings(self):
+        # Save theme
+        theme = 'dark' if self.dark_theme.isChecked() else 'light'
+        self.settings.setValue('theme', theme)
+        
+        # Save default subreddits
+        self.settings.setValue('default_subreddits', self.default_subreddits.text())
+        
+        # Save download concurrency and fetch engine
+        self.download_workers = self.download_workers_spin.value()
+        self.settings.setValue('download_workers', self.download_workers)
+        self.http.resize(self.http_pool_size())
+        self.set_fetch_engine(self.fetch_engine_combo.currentData())
+        
+        # Save how far ahead of the scroll position wallpapers are loaded
+        self.cards_ahead = self.cards_ahead_spin.value()
+        self.settings.setValue('cards_ahead', self.cards_ahead)
+        self.update_feed_target()
+        
+        # Save thumbnail source
+        self.thumbnail_source = 'preview' if self.use_previews_checkbox.isChecked() else 'original'
+        self.settings.setValue('thumbnail_source', self.thumbnail_source)
+        
+        # Apply theme
+        self.apply_theme(theme)
+        
+        # Update subreddit entry with new defaults
+        self.subreddit_entry.setText(self.default_subreddits.text())
+        
+        # Show success message
+        QMessageBox.information(self, "Success", "Settings saved successfully!")
+
+    def reset_settings(self):
+        reply = QMessageBox.question(
+            self,
+            "Reset Settings",
+            "Are you sure you want to reset all settings to default values?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        
+        if reply == QMessageBox.StandardButton.Yes:
+            # Reset theme
+            self.dark_theme.setChecked(True)
+            self.settings.setValue('theme', 'dark')
+            
+            # Reset subreddits
+            default_subreddits = 'wallpapers, wallpaper, widescreenwallpaper'
+            self.default_subreddits.setText(default_subreddits)
+            self.settings.setValue('default_subreddits', default_subreddits)
+            
+            # Reset download concurrency
+            self.download_workers = DEFAULT_DOWNLOAD_WORKERS
+            self.download_workers_spin.setValue(DEFAULT_DOWNLOAD_WORKERS)
+            self.settings.setValue('download_workers', DEFAULT_DOWNLOAD_WORKERS)
+            self.http.resize(self.http_pool_size())
+            self.fetch_engine_combo.setCurrentIndex(self.fetch_engine_combo.findData('thread'))
+            self.set_fetch_engine('thread')
+            self.cards_ahead = DEFAULT_CARDS_AHEAD
+            self.cards_ahead_spin.setValue(DEFAULT_CARDS_AHEAD)
+            self.settings.setValue('cards_ahead', DEFAULT_CARDS_AHEAD)
+            self.update_feed_target()
+            
+            # Reset thumbnail source
+            self.thumbnail_source = 'preview'
+            self.use_previews_checkbox.setChecked(True)
+            self.settings.setValue('thumbnail_source', 'preview')
+            
+            # Apply changes
+            self.apply_theme('dark')
+            self.subreddit_entry.setText(default_subreddits)
+            
+            QMessageBox.information(self, "Success", "Settings have been reset to defaults!")
+
+# Add new class for Settings dialog
+class SettingsDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.parent = parent
+        self.settings = parent.settings
+        self.setup_ui()
+        
+    def setup_ui(self):
+        self.setWindowTitle("Settings")
+        self.setMinimumWidth(400)
+        
+        layout = QVBoxLayout(self)
+        
+        # Theme selection
+        theme_group = QGroupBox("Theme")
+        theme_layout = QVBoxLayout()
+        self.dark_theme = QRadioButton("Dark")
+        self.light_theme = QRadioButton("Light")
+        current_theme = self.settings.value('theme', 'dark')
+        if current_theme == 'dark':
+            self.dark_theme.setChecked(True)
+        else:
+            self.light_theme.setChecked(True)
+        theme_layout.addWidget(self.dark_theme)
+        theme_layout.addWidget(self.light_theme)
+        theme_group.setLayout(theme_layout)
+        
+        # Default subreddits
+        subreddits_group = QGroupBox("Default Subreddits")
+        subreddits_layout = QVBoxLayout()
+        self.default_subreddits = QLineEdit()
+        self.default_subreddits.setText(self.settings.value('default_subreddits', 
+            'wallpapers, wallpaper, widescreenwallpaper'))
+        subreddits_layout.addWidget(self.default_subreddits)
+        subreddits_group.setLayout(subreddits_layout)
+        
+        # Save button
+        save_button = QPushButton("Save Settings")
+        save_button.clicked.connect(self.save_settings)
+        
+        layout.addWidget(theme_group)
+        layout.addWidget(subreddits_group)
+        layout.addWidget(save_button)
+        layout.addStretch()
+        
+    def save_settings(self):
+        # Save theme
+        theme = 'dark' if self.dark_theme.isChecked() else 'light'
+        self.settings.setValue('theme', theme)
+        
+        # Save default subreddits
+        self.settings.setValue('default_subreddits', self.default_subreddits.text())
+        
+        # Apply theme
+        self.parent.apply_theme(theme)
+        self.accept()
+
+def run():
+    # Started by main.py
+    app = QApplication(sys.argv)
+    window = WallpaperDownloader()
+    window.show()
+    return app.exec()
+
@@ -0,0 +1,1054 @@
+# Reddit listing, resolution filtering, download and thumbnail logic shared
+# by the GUI (wallpaper_app.py) and the headless harvester (harvest.py).
+# Nothing in here may import PyQt6.
+import os
+import platform
+import time
+import uuid
+import hashlib
+import html
+import json
+import struct
+import multiprocessing
+from abc import ABC, abstractmethod
+from io import BytesIO
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Event, Lock
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from PIL import Image, features
+
+from metrics import METRICS, REJECTED_AFTER_DOWNLOAD, REJECTED_BY_HEADER, REJECTED_BY_METADATA
+
+DEFAULT_WALLPAPER_DIR = os.path.join(os.path.expanduser('~'), 'Pictures', 'Wallpapers')
+
+REDDIT_BASE_URL = 'https://www.reddit.com'
+IMAGES_PER_PAGE = 18
+THUMBNAIL_SIZE = 300
+RESOLUTION_TOLERANCE = 100  # pixels tolerance for resolution matching
+DEFAULT_DOWNLOAD_WORKERS = 6
+MAX_DOWNLOAD_WORKERS = 32
+THUMBNAIL_CACHE_MAX_BYTES = 200 * 1024 * 1024
+THUMBNAIL_PROCESSES = os.cpu_count() or 4
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+REQUEST_TIMEOUT = (10, 30)  # connect, read
+LISTING_SORT = 'hot'
+LISTING_CACHE_TTL = 120  # seconds a listing is reused without asking Reddit
+LISTING_CACHE_MAX_ENTRIES = 256
+# A subreddit whose listing failed (other than a 4xx, which ends it) is
+# asked again after this many seconds, doubling up to the maximum
+LISTING_RETRY_DELAY = 2
+LISTING_RETRY_MAX_DELAY = 60
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Header probing: the image size is looked for after every chunk until this
+# much of the body has arrived
+PROBE_CHUNK_SIZE = 8 * 1024
+PROBE_MAX_BYTES = 256 * 1024
+
+class ImageRejected(Exception):
+    # A header check turned the image down, the rest was never downloaded
+    pass
+
+class DownloadCancelled(Exception):
+    pass
+
+class ListingUnavailable(Exception):
+    # A page got no listing from any subreddit, and nothing was queued
+    pass
+
+def get_app_data_dir():
+    if platform.system() == "Windows":
+        base = os.environ.get('LOCALAPPDATA') or os.environ.get('APPDATA') or os.path.expanduser('~')
+    elif platform.system() == "Darwin":
+        base = os.path.join(os.path.expanduser('~'), 'Library', 'Application Support')
+    else:
+        base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base, 'RedditWallpaperDownloader')
+
+APP_DATA_DIR = get_app_data_dir()
+
+class HttpClient:
+    # One pooled session shared by every worker thread. Connections to
+    # i.redd.it / www.reddit.com are kept alive, transient failures are
+    # retried with exponential backoff, and Reddit's rate-limit headers pause
+    # further requests to that host until the window resets.
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, pool_size=DEFAULT_DOWNLOAD_WORKERS):
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        self.rate_lock = Lock()
+        self.blocked_until = {}  # host -> time.monotonic() deadline
+        self.adapter = None
+        self.resize(pool_size)
+
+    def resize(self, pool_size):
+        # pool_size: every thread that may use the session at once, extra
+        # ones would open connections that are thrown away afterwards
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=('GET', 'HEAD'),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # Requests already running on the old pools finish, their
+        # connections are closed instead of going back to it
+        if self.adapter:
+            self.adapter.close()
+        self.adapter = adapter
+
+    def get(self, url, **kwargs):
+        host = urlsplit(url).hostname
+        delay = self.rate_limit_delay(host)
+        if delay > 0:
+            time.sleep(delay)
+        kwargs.setdefault('timeout', REQUEST_TIMEOUT)
+        response = self.session.get(url, **kwargs)
+        self.update_rate_limit(host, response.headers)
+        return response
+
+    def get_content(self, url, header_check=None):
+        # The whole body of url. header_check(width, height) is called as soon
+        # as the image header has arrived; if it returns False the connection
+        # is dropped and ImageRejected raised, so a mismatch costs kilobytes.
+        with METRICS.span('image.download'):
+            if not header_check:
+                response = self.get(url)
+                response.raise_for_status()
+                METRICS.count('image.bytes', len(response.content))
+                return response.content
+            
+            with self.get(url, stream=True) as response:
+                response.raise_for_status()
+                probe = HeaderProbe(url, header_check)
+                body = bytearray()
+                try:
+                    for chunk in response.iter_content(PROBE_CHUNK_SIZE):
+                        body += chunk
+                        probe.feed(body)
+                finally:
+                    METRICS.count('image.bytes', len(body))
+                return bytes(body)
+
+    def download(self, url, dest_path, progress_callback=None, cancel_event=None, hasher=None, header_check=None):
+        # Streams url into dest_path + '.part' and renames it into place when
+        # complete, so memory stays flat and dest_path is never half written.
+        # A .part file left by an interrupted download is resumed with Range,
+        # but only if the remote file is still the one it was started from
+        # (If-Range with the validator saved next to it).
+        # hasher (e.g. hashlib.sha256()) is fed every byte of the final file.
+        # header_check works as in get_content() (not when resuming).
+        with METRICS.span('file.download'):
+            return self._download(url, dest_path, progress_callback, cancel_event, hasher, header_check)
+
+    def _download(self, url, dest_path, progress_callback, cancel_event, hasher, header_check):
+        part_path = dest_path + '.part'
+        validator_path = part_path + '.validator'
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {}
+        if offset:
+            try:
+                with open(validator_path, 'r', encoding='utf-8') as f:
+                    headers = {'Range': f'bytes={offset}-', 'If-Range': f.read()}
+            except OSError:
+                # Nothing to tell whether the remote file changed since
+                offset = 0
+        
+        with self.get(url, headers=headers, stream=True) as response:
+            if offset and (response.status_code == 416 or (
+                    response.status_code == 206 and content_range_start(response.headers) != offset)):
+                # The partial file doesn't fit the remote one any more
+                response.close()
+                discard_partial(part_path)
+                return self._download(url, dest_path, progress_callback, cancel_event, hasher, header_check)
+            response.raise_for_status()
+            if response.status_code != 206:
+                # Server ignored the range or the file changed, start over
+                offset = 0
+                validator = resume_validator(response.headers)
+                if validator:
+                    with open(validator_path, 'w', encoding='utf-8') as f:
+                        f.write(validator)
+                elif os.path.exists(validator_path):
+                    os.remove(validator_path)
+            elif hasher:
+                with open(part_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+                        hasher.update(chunk)
+            
+            content_length = response.headers.get('Content-Length')
+            total = int(content_length) + offset if content_length else None
+            received = offset
+            probe = HeaderProbe(url, header_check if not offset else None)
+            head = bytearray()
+            # Small chunks while probing, so the header is seen early
+            chunk_size = PROBE_CHUNK_SIZE if probe.pending else DOWNLOAD_CHUNK_SIZE
+            
+            with open(part_path, 'ab' if offset else 'wb') as f:
+                for chunk in response.iter_content(chunk_size):
+                    if cancel_event and cancel_event.is_set():
+                        raise DownloadCancelled(url)
+                    if probe.pending:
+                        head += chunk
+                        try:
+                            probe.feed(head)
+                        except ImageRejected:
+                            f.close()
+                            discard_partial(part_path)
+                            raise
+                    f.write(chunk)
+                    if hasher:
+                        hasher.update(chunk)
+                    received += len(chunk)
+                    METRICS.count('file.bytes', len(chunk))
+                    if progress_callback:
+                        progress_callback(received, total)
+        
+        os.replace(part_path, dest_path)
+        if os.path.exists(validator_path):
+            os.remove(validator_path)
+        return dest_path
+
+    def rate_limit_delay(self, host):
+        # Seconds to wait before the next request to host
+        with self.rate_lock:
+            return self.blocked_until.get(host, 0) - time.monotonic()
+
+    def update_rate_limit(self, host, headers):
+        remaining = headers.get('x-ratelimit-remaining')
+        reset = headers.get('x-ratelimit-reset')
+        if remaining is None or reset is None:
+            return
+        try:
+            if float(remaining) >= 1:
+                return
+            deadline = time.monotonic() + float(reset)
+        except ValueError:
+            return
+        with self.rate_lock:
+            self.blocked_until[host] = max(self.blocked_until.get(host, 0), deadline)
+
+def resume_validator(headers):
+    # What If-Range can check a resumed download against: a strong ETag,
+    # else Last-Modified (None: the download can't be resumed safely)
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return headers.get('Last-Modified')
+
+def content_range_start(headers):
+    # First byte of a 206 body, from 'Content-Range: bytes 100-199/200'
+    try:
+        return int(headers.get('Content-Range', '').split()[1].split('-')[0])
+    except (IndexError, ValueError):
+        return None
+
+def discard_partial(part_path):
+    for path in (part_path, part_path + '.validator'):
+        if os.path.exists(path):
+            os.remove(path)
+
+class HeaderProbe:
+    # Looks for the image size in the first bytes of a body as they arrive
+    def __init__(self, url, header_check):
+        self.url = url
+        self.header_check = header_check
+        self.pending = header_check is not None
+
+    def feed(self, head):
+        if not self.pending:
+            return
+        dimensions = probe_dimensions(head)
+        if dimensions:
+            self.pending = False
+            if not self.header_check(*dimensions):
+                raise ImageRejected(self.url)
+        elif len(head) >= PROBE_MAX_BYTES:
+            # No size in sight (or not an image we can read), just download it
+            self.pending = False
+
+class WallpaperStore:
+    # Wallpapers downloaded for "Set as Wallpaper" are stored once per content
+    # hash. The index (a WallpaperIndex) maps source URL -> sha256 -> file in
+    # this directory, so a URL seen before never touches the network again
+    # and a crosspost of the same image reuses the file already on disk.
+
+    def __init__(self, directory, http, index):
+        self.directory = directory
+        self.http = http
+        self.index = index
+        self.lock = Lock()
+        self.url_locks = {}
+
+    def lookup(self, url):
+        with self.lock:
+            digest = self.index.url_hash(url)
+            return self._existing_path(digest) if digest else None
+
+    def fetch(self, url, progress_callback=None, cancel_event=None, header_check=None):
+        # Two jobs for the same URL would share the temporary file
+        with self.lock:
+            url_lock = self.url_locks.setdefault(url, Lock())
+        with url_lock:
+            return self._fetch(url, progress_callback, cancel_event, header_check)
+
+    def _fetch(self, url, progress_callback, cancel_event, header_check):
+        path = self.lookup(url)
+        if path:
+            return path
+        
+        # Named after the URL so an interrupted download resumes next time
+        url_id = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+        tmp_path = os.path.join(self.directory, f'.download_{url_id}.tmp')
+        hasher = hashlib.sha256()
+        self.http.download(url, tmp_path, progress_callback, cancel_event, hasher, header_check)
+        return self._commit(url, tmp_path, hasher.hexdigest())
+
+    def add(self, url, content):
+        # Same as fetch() for a body that has already been downloaded
+        path = self.lookup(url)
+        if path:
+            return path
+        tmp_path = os.path.join(self.directory, f'.download_{uuid.uuid4().hex[:16]}.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        return self._commit(url, tmp_path, hashlib.sha256(content).hexdigest())
+
+    def _commit(self, url, tmp_path, digest):
+        with self.lock:
+            path = self._existing_path(digest)
+            if path:
+                os.remove(tmp_path)
+            else:
+                extension = os.path.splitext(urlsplit(url).path)[1].lower()
+                if extension not in ('.jpg', '.jpeg', '.png'):
+                    extension = '.jpg'
+                filename = f'wallpaper_{digest[:16]}{extension}'
+                path = os.path.join(self.directory, filename)
+                os.replace(tmp_path, path)
+                self.index.add_file(path, digest)
+            self.index.link_url(url, digest)
+        return path
+
+    def discard(self, url):
+        # Forget url, and delete its file unless another URL shares it
+        with self.lock:
+            digest = self.index.url_hash(url)
+            if digest and self.index.unlink_url(url) == 0:
+                path = self._existing_path(digest)
+                if path:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    self.index.remove_file(path)
+
+    def _existing_path(self, digest):
+        path = self.index.file_for_hash(self.directory, digest)
+        if path and not os.path.exists(path):
+            # Deleted from the wallpaper directory behind our back
+            self.index.remove_file(path)
+            return None
+        return path
+
+class ListingCache:
+    # Raw listing JSON by (subreddit, sort, cursor, limit), kept in memory.
+    # Within ttl a listing is reused as is, so a new search or resolution
+    # soon after the last one doesn't hit Reddit. After that it is
+    # revalidated with If-None-Match / If-Modified-Since, and a 304 keeps it.
+    def __init__(self, ttl=LISTING_CACHE_TTL, max_entries=LISTING_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = Lock()
+        self.entries = OrderedDict()  # key -> {'content', 'validators', 'fetched_at'}
+
+    @staticmethod
+    def key(subreddit_name, after, limit):
+        return (subreddit_name.lower(), LISTING_SORT, after, limit)
+
+    def fresh(self, key):
+        # The cached body if it is still within ttl
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and time.monotonic() - entry['fetched_at'] < self.ttl:
+                self.entries.move_to_end(key)
+                return entry['content']
+        return None
+
+    def validators(self, key):
+        # Request headers that let the server answer 304 Not Modified
+        with self.lock:
+            entry = self.entries.get(key)
+            return dict(entry['validators']) if entry else {}
+
+    def store(self, key, content, headers):
+        validators = {}
+        if headers.get('ETag'):
+            validators['If-None-Match'] = headers['ETag']
+        if headers.get('Last-Modified'):
+            validators['If-Modified-Since'] = headers['Last-Modified']
+        with self.lock:
+            self.entries[key] = {'content': content, 'validators': validators, 'fetched_at': time.monotonic()}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def revalidated(self, key):
+        # After a 304: the cached body, good for another ttl (None if it
+        # was evicted in the meantime)
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry:
+                return None
+            entry['fetched_at'] = time.monotonic()
+            self.entries.move_to_end(key)
+            return entry['content']
+
+class ThumbnailCache:
+    # Each entry is one file: an 8 byte header with the original width/height
+    # followed by the encoded thumbnail. File mtime doubles as the LRU clock so
+    # recency survives restarts. Thumbnails are only encoded here, everything
+    # else passes raw pixels around.
+    HEADER = struct.Struct('>II')
+    # Fast lossy WebP when Pillow has it: ~4x quicker to encode than PNG and
+    # a third of the size. Older PNG entries still load.
+    if features.check('webp'):
+        FORMAT, FORMAT_OPTIONS = 'WEBP', {'quality': 90, 'method': 0}
+    else:
+        FORMAT, FORMAT_OPTIONS = 'PNG', {}
+
+    def __init__(self, directory, max_bytes=THUMBNAIL_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+        
+        # Least recently used first
+        self.entries = OrderedDict()
+        found = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith('.thumb'):
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(found):
+            self.entries[name] = size
+        self.total_bytes = sum(self.entries.values())
+        self.evict()
+
+    @staticmethod
+    def url_key(url):
+        return f"url:{url}"
+
+    @staticmethod
+    def file_key(path):
+        # A changed file gets a new key, the stale entry just ages out
+        stat = os.stat(path)
+        return f"file:{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+    def _entry_name(self, key):
+        return hashlib.sha1(key.encode('utf-8')).hexdigest() + '.thumb'
+
+    def get(self, key):
+        name = self._entry_name(key)
+        with self.lock:
+            if name not in self.entries:
+                METRICS.count('thumbnail_cache.misses')
+                return None
+            self.entries.move_to_end(name)
+        
+        with METRICS.span('thumbnail_cache.get'):
+            processed_data = self._load(name)
+        METRICS.count('thumbnail_cache.hits' if processed_data else 'thumbnail_cache.misses')
+        return processed_data
+
+    def _load(self, name):
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+            width, height = self.HEADER.unpack_from(data)
+            with Image.open(BytesIO(data[self.HEADER.size:])) as image:
+                processed_data = thumbnail_pixels(image)
+        except (OSError, struct.error):
+            self._forget(name)
+            return None
+        
+        processed_data['width'] = width
+        processed_data['height'] = height
+        return processed_data
+
+    def put(self, key, processed_data):
+        with METRICS.span('thumbnail_cache.put'):
+            self._store(key, processed_data)
+
+    def _store(self, key, processed_data):
+        name = self._entry_name(key)
+        path = os.path.join(self.directory, name)
+        image = Image.frombytes(processed_data['mode'], processed_data['thumbnail_size'], processed_data['pixels'])
+        buffer = BytesIO()
+        buffer.write(self.HEADER.pack(processed_data['width'], processed_data['height']))
+        image.save(buffer, format=self.FORMAT, **self.FORMAT_OPTIONS)
+        data = buffer.getvalue()
+        
+        try:
+            # Write then rename so a concurrent reader never sees half an entry
+            tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing thumbnail cache: {e}")
+            return
+        
+        with self.lock:
+            self.total_bytes += len(data) - self.entries.pop(name, 0)
+            self.entries[name] = len(data)
+        self.evict()
+
+    def evict(self):
+        with self.lock:
+            victims = []
+            while self.total_bytes > self.max_bytes and self.entries:
+                name, size = self.entries.popitem(last=False)
+                self.total_bytes -= size
+                victims.append(name)
+        
+        for name in victims:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def _forget(self, name):
+        with self.lock:
+            self.total_bytes -= self.entries.pop(name, 0)
+
+IMAGE_EXTENSIONS = ('.jpg', '.png', '.jpeg')
+
+def parse_resolution(text):
+    # "1920x1080" or "1920x1080 (FHD)" -> (1920, 1080), nothing -> None.
+    # Raises ValueError for anything else.
+    text = (text or '').strip()
+    if not text or text == "All Resolutions":
+        return None
+    width, height = map(int, text.split(" ")[0].lower().split('x'))
+    return width, height
+
+def matches_resolution(width, height, desired_width, desired_height, tolerance=RESOLUTION_TOLERANCE):
+    width_matches = abs(width - desired_width) <= tolerance
+    height_matches = abs(height - desired_height) <= tolerance
+    # Also check rotated orientation
+    rotated_width_matches = abs(width - desired_height) <= tolerance
+    rotated_height_matches = abs(height - desired_width) <= tolerance
+    
+    return ((width_matches and height_matches) or 
+            (rotated_width_matches and rotated_height_matches))
+
+def get_listing_dimensions(post_data):
+    # Reddit reports the original size in the preview block of the listing
+    try:
+        source = post_data['preview']['images'][0]['source']
+        return int(source['width']), int(source['height'])
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
+
+def get_preview_url(post_data, min_size=THUMBNAIL_SIZE):
+    # Smallest rendition whose long side still fills a card
+    try:
+        renditions = post_data['preview']['images'][0]['resolutions']
+    except (KeyError, IndexError, TypeError):
+        return None
+    
+    large_enough = [
+        r for r in renditions
+        if max(r.get('width', 0), r.get('height', 0)) >= min_size
+    ]
+    if not large_enough:
+        return None
+    smallest = min(large_enough, key=lambda r: r['width'] * r['height'])
+    # Listing URLs are HTML escaped (&amp;)
+    return html.unescape(smallest['url'])
+
+def get_thumbnail_source(post_data, mode='preview'):
+    # Returns (thumbnail_url, original dimensions) for process_image. The
+    # original is only downloaded for the card when no preview will do.
+    if mode == 'preview':
+        dimensions = get_listing_dimensions(post_data)
+        preview_url = get_preview_url(post_data)
+        if dimensions and preview_url:
+            return preview_url, dimensions
+    return None, None
+
+def listing_url(subreddit_name, after, limit, base_url=REDDIT_BASE_URL):
+    after_param = f"&after={after}" if after else ""
+    return f'{base_url}/r/{subreddit_name}/{LISTING_SORT}.json?limit={limit}{after_param}'
+
+def parse_listing(subreddit_name, data):
+    # Add subreddit name to each post for display
+    posts = data['data']['children']
+    for post in posts:
+        post['data']['subreddit_display'] = f"r/{subreddit_name}"
+    
+    return posts, data['data'].get('after')
+
+def is_client_error(error):
+    # A 4xx other than 429 from either engine's HTTP library, asking again
+    # won't help
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(error, 'status', None)
+    return isinstance(status, int) and 400 <= status < 500 and status != 429
+
+def fetch_listing(http, subreddit_name, after, limit, cache=None, base_url=REDDIT_BASE_URL):
+    url = listing_url(subreddit_name, after, limit, base_url)
+    with METRICS.span('listing.fetch'):
+        if cache is None:
+            response = http.get(url)
+            response.raise_for_status()
+            METRICS.count('listing.bytes', len(response.content))
+            return parse_listing(subreddit_name, response.json())
+        
+        key = ListingCache.key(subreddit_name, after, limit)
+        content = cache.fresh(key)
+        if content is not None:
+            METRICS.count('listing_cache.hits')
+        else:
+            response = http.get(url, headers=cache.validators(key))
+            if response.status_code == 304:
+                content = cache.revalidated(key)
+                if content is not None:
+                    METRICS.count('listing_cache.revalidated')
+            if content is None:
+                if response.status_code == 304:
+                    # Evicted since the request went out, ask again
+                    response = http.get(url)
+                response.raise_for_status()
+                content = response.content
+                METRICS.count('listing.bytes', len(content))
+                cache.store(key, content, response.headers)
+        # Parsed afresh every time, the posts get modified downstream
+        return parse_listing(subreddit_name, json.loads(content))
+
+def make_thumbnail(image):
+    # Only the header has been read at this point
+    width, height = image.size
+    
+    # JPEGs can be decoded at 1/2, 1/4 or 1/8 scale straight from the DCT
+    # coefficients; ask for the smallest one that still covers the thumbnail
+    # (thumbnail() alone would stop at twice the size)
+    scale = min(THUMBNAIL_SIZE / width, THUMBNAIL_SIZE / height, 1)
+    image.draft(None, (max(1, int(width * scale)), max(1, int(height * scale))))
+    
+    # Create thumbnail
+    image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+    
+    processed_data = thumbnail_pixels(image)
+    processed_data['width'] = width
+    processed_data['height'] = height
+    return processed_data
+
+def thumbnail_pixels(image):
+    # Raw 8-bit RGB/RGBA rows, which the GUI wraps in a QImage as they are
+    mode = 'RGBA' if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info else 'RGB'
+    if image.mode != mode:
+        image = image.convert(mode)
+    return {
+        'pixels': image.tobytes(),
+        'mode': mode,
+        'thumbnail_size': image.size
+    }
+
+# These two run in the thumbnail process pool, so they only take and return
+# plain picklable values
+def thumbnail_from_bytes(content, dimensions=None):
+    with Image.open(BytesIO(content)) as image:
+        processed_data = make_thumbnail(image)
+    if dimensions:
+        processed_data['width'], processed_data['height'] = dimensions
+    return processed_data
+
+def thumbnail_from_file(file_path):
+    with Image.open(file_path) as image:
+        return make_thumbnail(image)
+
+def probe_dimensions(head):
+    # Image size from the first bytes of a file, or None while the header is
+    # still incomplete. Pillow only needs the header for JPEG and PNG but
+    # wants the whole file for WebP, so that one is parsed here.
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        if len(head) < 30:
+            return None
+        chunk = head[12:16]
+        if chunk == b'VP8X':
+            return (int.from_bytes(head[24:27], 'little') + 1, int.from_bytes(head[27:30], 'little') + 1)
+        if chunk == b'VP8L':
+            bits = int.from_bytes(head[21:25], 'little')
+            return ((bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+        if chunk == b'VP8 ':
+            return (int.from_bytes(head[26:28], 'little') & 0x3FFF, int.from_bytes(head[28:30], 'little') & 0x3FFF)
+        return None
+    try:
+        with Image.open(BytesIO(head)) as image:
+            return image.size
+    except Exception:
+        return None
+
+def read_dimensions(file_path):
+    # Parses the header only, no pixel data is decoded
+    with Image.open(file_path) as image:
+        return image.size
+
+_thumbnail_pool = None
+_thumbnail_pool_lock = Lock()
+
+def render_thumbnail(function, *args):
+    # Decoding and resizing hold the GIL, so threads can't spread them over
+    # the cores; worker processes can. Blocks the calling (worker) thread.
+    global _thumbnail_pool
+    with _thumbnail_pool_lock:
+        if _thumbnail_pool is None:
+            try:
+                # spawn rather than fork: the GUI has Qt and worker threads running
+                _thumbnail_pool = ProcessPoolExecutor(max_workers=THUMBNAIL_PROCESSES,
+                                                      mp_context=multiprocessing.get_context('spawn'))
+            except (OSError, NotImplementedError) as e:
+                # No multiprocessing on this platform, decode in this process
+                print(f"Thumbnail process pool unavailable: {e}")
+                _thumbnail_pool = False
+        pool = _thumbnail_pool
+    
+    if pool is False:
+        with METRICS.span('thumbnail.render'):
+            return function(*args)
+    try:
+        # Decode and resize in the worker, plus the round trip to it
+        with METRICS.span('thumbnail.render'):
+            return pool.submit(function, *args).result()
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory on a huge image), start over next time
+        with _thumbnail_pool_lock:
+            if _thumbnail_pool is pool:
+                _thumbnail_pool = None
+        raise
+
+def shutdown_thumbnail_pool():
+    # Stops the worker processes; the next render_thumbnail() starts new ones
+    global _thumbnail_pool
+    with _thumbnail_pool_lock:
+        pool, _thumbnail_pool = _thumbnail_pool, None
+    if pool:
+        pool.shutdown()
+
+def process_image(http, thumbnail_cache, image_url, thumbnail_url=None, dimensions=None):
+    # thumbnail_url can point at a smaller rendition of image_url, in which
+    # case dimensions must carry the size of the original
+    try:
+        cache_key = ThumbnailCache.url_key(image_url)
+        cached = thumbnail_cache.get(cache_key)
+        if cached:
+            return cached
+        
+        with METRICS.span('image.download'):
+            response = http.get(thumbnail_url or image_url)
+            response.raise_for_status()
+        METRICS.count('image.bytes', len(response.content))
+        processed_data = render_thumbnail(thumbnail_from_bytes, response.content, dimensions)
+        
+        thumbnail_cache.put(cache_key, processed_data)
+        return processed_data
+    except Exception as e:
+        print(f"Error processing image: {e}")
+        return None
+
+def process_local_image(thumbnail_cache, file_path):
+    try:
+        cache_key = ThumbnailCache.file_key(file_path)
+        processed_data = thumbnail_cache.get(cache_key)
+        if not processed_data:
+            processed_data = render_thumbnail(thumbnail_from_file, file_path)
+            thumbnail_cache.put(cache_key, processed_data)
+        return processed_data
+        
+    except Exception as e:
+        print(f"Error loading image {file_path}: {e}")
+        return None
+
+class ImageTask(ABC):
+    # What a fetch engine does with each candidate post. cached() may answer
+    # without any network I/O; otherwise the engine downloads url() and hands
+    # the body to finish(), which does the CPU work. Results are dicts with
+    # the original width/height, or None to skip the post.
+    MISS = object()
+
+    def cached(self, post_data):
+        return self.MISS
+
+    def url(self, post_data):
+        return post_data['url']
+
+    @abstractmethod
+    def finish(self, post_data, content):
+        pass
+
+    def run(self, http, post_data, header_check=None):
+        # The blocking path used by the thread engine. header_check: see
+        # WallpaperSearch.header_check()
+        result = self.cached(post_data)
+        if result is not self.MISS:
+            return result
+        try:
+            content = http.get_content(self.url(post_data), header_check)
+        except ImageRejected:
+            return None
+        return self.finish(post_data, content)
+
+class ThumbnailTask(ImageTask):
+    # Grid cards: a thumbnail from the disk cache, a preview rendition or
+    # the original, depending on mode ('preview' or 'original')
+    def __init__(self, thumbnail_cache, mode='preview'):
+        self.thumbnail_cache = thumbnail_cache
+        self.mode = mode
+
+    def cached(self, post_data):
+        post_data['thumbnail_source'] = get_thumbnail_source(post_data, self.mode)
+        cached = self.thumbnail_cache.get(ThumbnailCache.url_key(post_data['url']))
+        return cached if cached else self.MISS
+
+    def url(self, post_data):
+        return post_data['thumbnail_source'][0] or post_data['url']
+
+    def finish(self, post_data, content):
+        processed_data = render_thumbnail(thumbnail_from_bytes, content, post_data['thumbnail_source'][1])
+        self.thumbnail_cache.put(ThumbnailCache.url_key(post_data['url']), processed_data)
+        return processed_data
+
+class WallpaperSearch:
+    # One search over several subreddits, consumed a page at a time. Every
+    # subreddit keeps its own listing cursor and queue of candidates, fed as
+    # soon as its listing arrives (add_listing) and taken in turn
+    # (next_candidate), so downloads don't wait for the slowest listing. An
+    # image URL is only offered once, and candidates a page didn't need are
+    # kept for the next one. The network work itself is done by a fetch
+    # engine (see fetch_engines.py).
+    # Everything offered so far is remembered, so the resolution filter can
+    # change without starting over (see set_resolution).
+    def __init__(self, engine, subreddit_names, resolution=None, limit=None, index=None,
+                 listing_cache=None, base_url=REDDIT_BASE_URL):
+        self.engine = engine
+        # Somewhere else than reddit.com, e.g. the benchmark's mock server
+        self.base_url = base_url
+        # Optional ListingCache shared between searches
+        self.listing_cache = listing_cache
+        # Optional WallpaperIndex: posts are recorded and sizes learned in
+        # earlier sessions save downloads
+        self.index = index
+        self.known_dimensions = {}  # url -> size from the index or learned this session
+        self.subreddit_names = [name for name in subreddit_names if name]
+        self.desired_resolution = parse_resolution(resolution)
+        # Distribute limit across subreddits
+        self.limit = limit or max(50 // max(len(self.subreddit_names), 1), 10)
+        self.after_ids = {}  # subreddit -> listing cursor, None once exhausted
+        self.listing_failures = {}  # subreddit -> failed listings in a row
+        self.retry_at = {}  # subreddit -> time.monotonic() before which it isn't asked again
+        self.listing_error = None  # the latest, for ListingUnavailable
+        self.listings_received = 0
+        self.seen_urls = set()
+        self.seen_candidates = []  # (subreddit, post) for every post offered, in offer order
+        self.delivered_urls = set()
+        self.leftover_candidates = deque()  # handed out before the queues
+        self.queues = {}  # subreddit -> deque of candidates
+        self.queue_order = deque()  # subreddits, rotated as candidates are taken
+
+    def active_subreddits(self):
+        # Subreddits whose listing has run out are not requested again
+        return [
+            name for name in self.subreddit_names
+            if name not in self.after_ids or self.after_ids[name]
+        ]
+
+    def listings_due(self):
+        # The subreddits to request a listing from now
+        now = time.monotonic()
+        return [name for name in self.active_subreddits() if self.retry_at.get(name, 0) <= now]
+
+    def has_more(self):
+        return self.has_queued() or bool(self.active_subreddits())
+
+    def has_queued(self):
+        return bool(self.leftover_candidates) or any(self.queues.values())
+
+    def queued_count(self):
+        return len(self.leftover_candidates) + sum(len(queue) for queue in self.queues.values())
+
+    def matches(self, width, height):
+        if not self.desired_resolution:
+            return True
+        return matches_resolution(width, height, *self.desired_resolution)
+
+    def header_check(self, post_data):
+        # Posts the listing had no size for are downloaded to find out, but
+        # the size is in the first few KB: returns a check for the engine to
+        # run on the header, so a mismatch is dropped before the rest arrives
+        if not self.desired_resolution or self.size_known(post_data):
+            return None
+        
+        def check(width, height):
+            self.learn_dimensions(post_data, width, height)
+            if self.matches(width, height):
+                return True
+            METRICS.count(REJECTED_BY_HEADER)
+            return False
+        return check
+
+    def accept(self, post_data, result):
+        # Called by the engines with each task result (None: skipped)
+        if not result:
+            return False
+        self.learn_dimensions(post_data, result['width'], result['height'])
+        if not self.matches(result['width'], result['height']):
+            METRICS.count(REJECTED_AFTER_DOWNLOAD)
+            return False
+        return True
+
+    def size_known(self, post_data):
+        return bool(get_listing_dimensions(post_data)) or post_data['url'] in self.known_dimensions
+
+    def learn_dimensions(self, post_data, width, height):
+        if not self.size_known(post_data):
+            self.known_dimensions[post_data['url']] = (width, height)
+            if self.index:
+                self.index.set_dimensions(post_data['url'], width, height)
+
+    def set_resolution(self, resolution):
+        # Switch the filter in place. Results already delivered are the
+        # caller's to re-filter (they are in delivered_urls); every other post
+        # seen so far goes back to its subreddit's queue in its original
+        # order, minus the ones whose known size rules them out, so they are
+        # mixed as before. Listing cursors are kept, so only what the queues
+        # can't fill is fetched. Must not run during a page.
+        self.desired_resolution = parse_resolution(resolution)
+        self.leftover_candidates.clear()
+        for queue in self.queues.values():
+            queue.clear()
+        for subreddit_name, post_data in self.seen_candidates:
+            if post_data['url'] not in self.delivered_urls:
+                self.queues[subreddit_name].append(post_data)
+        if self.desired_resolution:
+            for subreddit_name, queue in self.queues.items():
+                self.queues[subreddit_name] = deque(self.prefilter_by_metadata(list(queue)))
+
+    def fetch_page(self, task, on_result, cancel_event=None, max_results=IMAGES_PER_PAGE):
+        # on_result(post_data, result, index) is called in listing order for
+        # every matching result, at most max_results times (None: no limit).
+        # Returns the number of results delivered.
+        # Raises ListingUnavailable if every listing failed and there was
+        # nothing else to deliver.
+        def deliver(post_data, result, index):
+            METRICS.count('candidates.delivered')
+            self.delivered_urls.add(post_data['url'])
+            on_result(post_data, result, index)
+        
+        cancel_event = cancel_event or Event()
+        if not self.has_queued() and not self.listings_due():
+            # Every subreddit left is backing off after an error
+            retry_at = min((self.retry_at.get(name, 0) for name in self.active_subreddits()), default=0)
+            cancel_event.wait(max(retry_at - time.monotonic(), 0))
+        received = self.listings_received
+        self.listing_error = None
+        found = self.engine.run_page(self, task, deliver, cancel_event, max_results)
+        if (not found and self.listing_error and self.listings_received == received and not self.has_queued()
+                and not cancel_event.is_set()):
+            raise ListingUnavailable(str(self.listing_error))
+        return found
+
+    def add_listing(self, subreddit_name, listing):
+        # One subreddit's listing page, (posts, after) or the exception
+        # raised while fetching it. After a 4xx (no such subreddit, private,
+        # banned) it is not asked again; after other errors the cursor stays
+        # put and it is asked again once its retry delay is up. Its new
+        # candidates are queued right away.
+        if isinstance(listing, Exception):
+            print(f"Error fetching from r/{subreddit_name}: {str(listing)}")
+            self.listing_error = listing
+            if is_client_error(listing):
+                self.after_ids[subreddit_name] = None
+                return
+            failures = self.listing_failures.get(subreddit_name, 0) + 1
+            self.listing_failures[subreddit_name] = failures
+            delay = min(LISTING_RETRY_DELAY * 2 ** (failures - 1), LISTING_RETRY_MAX_DELAY)
+            self.retry_at[subreddit_name] = time.monotonic() + delay
+            return
+        posts, after = listing
+        self.after_ids[subreddit_name] = after
+        self.listings_received += 1
+        self.listing_failures.pop(subreddit_name, None)
+        self.retry_at.pop(subreddit_name, None)
+        
+        if self.index:
+            try:
+                self.index.record_posts([post['data'] for post in posts])
+            except Exception as e:
+                print(f"Error updating the wallpaper index: {e}")
+        
+        # An image already offered (e.g. a crosspost) is never downloaded twice
+        candidates = []
+        for post in posts:
+            post_data = post['data']
+            image_url = post_data.get('url', '')
+            if image_url.endswith(IMAGE_EXTENSIONS) and image_url not in self.seen_urls:
+                self.seen_urls.add(image_url)
+                self.seen_candidates.append((subreddit_name, post_data))
+                candidates.append(post_data)
+        
+        if self.desired_resolution:
+            candidates = self.prefilter_by_metadata(candidates)
+        if subreddit_name not in self.queues:
+            self.queues[subreddit_name] = deque()
+            self.queue_order.append(subreddit_name)
+        self.queues[subreddit_name].extend(candidates)
+
+    def next_candidate(self):
+        # Leftovers of the previous page first, then one post from each
+        # subreddit in turn to mix them, keeping each listing's own order.
+        # None if nothing is queued (right now).
+        if self.leftover_candidates:
+            return self.leftover_candidates.popleft()
+        for _ in range(len(self.queue_order)):
+            queue = self.queues[self.queue_order[0]]
+            self.queue_order.rotate(-1)
+            if queue:
+                return queue.popleft()
+        return None
+
+    def requeue(self, candidates):
+        # Candidates taken but not used, to be handed out first next time
+        self.leftover_candidates.extendleft(reversed(candidates))
+
+    def prefilter_by_metadata(self, candidates):
+        # Reject mismatches before downloading anything. Posts the listing
+        # has no size for may still have one in the index, the rest have to
+        # be downloaded and checked.
+        if self.index:
+            unknown = [post_data['url'] for post_data in candidates if not get_listing_dimensions(post_data)]
+            if unknown:
+                self.known_dimensions.update(self.index.dimensions(unknown))
+        
+        kept = []
+        for post_data in candidates:
+            dimensions = get_listing_dimensions(post_data) or self.known_dimensions.get(post_data['url'])
+            if dimensions and not self.matches(*dimensions):
+                METRICS.count(REJECTED_BY_METADATA)
+                continue
+            kept.append(post_data)
+        return kept
@@ -0,0 +1,202 @@
+# Local SQLite index of what the app has learned about wallpapers, so it
+# survives restarts:
+#
+#   posts   - every listing post seen (id, subreddit, URL, title)
+#   images  - per image URL: the original size once known (from the listing,
+#             an image header or a decode) and the content hash once downloaded
+#   files   - wallpapers on disk: path, hash, size, mtime and dimensions
+#
+# One connection is shared by all threads behind a lock. WAL mode lets the
+# GUI and harvest.py use the same file at the same time.
+import os
+import sqlite3
+import time
+from threading import Lock
+
+from wallpaper_core import APP_DATA_DIR, get_listing_dimensions
+
+DEFAULT_INDEX_PATH = os.path.join(APP_DATA_DIR, 'index.sqlite3')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    post_id TEXT PRIMARY KEY,
+    subreddit TEXT,
+    url TEXT,
+    title TEXT,
+    first_seen REAL,
+    last_seen REAL
+);
+CREATE INDEX IF NOT EXISTS posts_url ON posts (url);
+CREATE TABLE IF NOT EXISTS images (
+    url TEXT PRIMARY KEY,
+    width INTEGER,
+    height INTEGER,
+    sha256 TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS images_sha256 ON images (sha256);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    directory TEXT,
+    sha256 TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    width INTEGER,
+    height INTEGER,
+    added_at REAL
+);
+CREATE INDEX IF NOT EXISTS files_directory ON files (directory);
+CREATE INDEX IF NOT EXISTS files_sha256 ON files (directory, sha256);
+"""
+
+class WallpaperIndex:
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.lock = Lock()
+        self.db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
+            self.db.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    # Listings and image sizes
+
+    def record_posts(self, posts):
+        # posts: listing post_data dicts. Sizes from the listing go to images.
+        now = time.time()
+        post_rows = []
+        size_rows = []
+        for post_data in posts:
+            url = post_data.get('url')
+            if not url:
+                continue
+            post_rows.append((post_data.get('name') or post_data.get('id') or url,
+                              post_data.get('subreddit'), url, post_data.get('title'), now, now))
+            dimensions = get_listing_dimensions(post_data)
+            if dimensions:
+                size_rows.append((url, dimensions[0], dimensions[1], now))
+        with self.lock, self.db:
+            self.db.executemany(
+                'INSERT INTO posts (post_id, subreddit, url, title, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (post_id) DO UPDATE SET title = excluded.title, last_seen = excluded.last_seen',
+                post_rows
+            )
+            self._upsert_sizes(size_rows)
+
+    def set_dimensions(self, url, width, height):
+        with self.lock, self.db:
+            self._upsert_sizes([(url, width, height, time.time())])
+
+    def _upsert_sizes(self, rows):
+        self.db.executemany(
+            'INSERT INTO images (url, width, height, updated_at) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (url) DO UPDATE SET width = excluded.width, height = excluded.height, '
+            'updated_at = excluded.updated_at',
+            rows
+        )
+
+    def dimensions(self, urls):
+        # url -> (width, height) for the urls whose size is known
+        urls = list(urls)
+        found = {}
+        with self.lock:
+            # Stay well below SQLite's limit on query parameters
+            for start in range(0, len(urls), 500):
+                batch = urls[start:start + 500]
+                rows = self.db.execute(
+                    f'SELECT url, width, height FROM images WHERE width IS NOT NULL '
+                    f'AND url IN ({",".join("?" * len(batch))})',
+                    batch
+                )
+                found.update((url, (width, height)) for url, width, height in rows)
+        return found
+
+    # Downloads and files on disk
+
+    def url_hash(self, url):
+        with self.lock:
+            row = self.db.execute('SELECT sha256 FROM images WHERE url = ?', (url,)).fetchone()
+        return row[0] if row else None
+
+    def link_url(self, url, digest):
+        with self.lock, self.db:
+            self.db.execute(
+                'INSERT INTO images (url, sha256, updated_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (url) DO UPDATE SET sha256 = excluded.sha256, updated_at = excluded.updated_at',
+                (url, digest, time.time())
+            )
+
+    def unlink_url(self, url):
+        # Returns how many other URLs still point at the same content
+        with self.lock, self.db:
+            row = self.db.execute('SELECT sha256 FROM images WHERE url = ?', (url,)).fetchone()
+            if not row or not row[0]:
+                return 0
+            self.db.execute('UPDATE images SET sha256 = NULL WHERE url = ?', (url,))
+            return self.db.execute('SELECT COUNT(*) FROM images WHERE sha256 = ?', (row[0],)).fetchone()[0]
+
+    def file_for_hash(self, directory, digest):
+        with self.lock:
+            row = self.db.execute(
+                'SELECT path FROM files WHERE directory = ? AND sha256 = ?',
+                (os.path.abspath(directory), digest)
+            ).fetchone()
+        return row[0] if row else None
+
+    def add_file(self, path, digest=None, width=None, height=None):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self.lock, self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO files (path, directory, sha256, size, mtime_ns, width, height, added_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (path, os.path.dirname(path), digest, stat.st_size, stat.st_mtime_ns, width, height, time.time())
+            )
+
+    def remove_file(self, path):
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM files WHERE path = ?', (os.path.abspath(path),))
+
+    def set_file_dimensions(self, path, width, height):
+        with self.lock, self.db:
+            self.db.execute('UPDATE files SET width = ?, height = ? WHERE path = ?',
+                            (width, height, os.path.abspath(path)))
+
+    def list_files(self, directory):
+        # path -> {'stats': (mtime_ns, size), 'width', 'height'}, no disk access
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT path, mtime_ns, size, width, height FROM files WHERE directory = ?',
+                (os.path.abspath(directory),)
+            ).fetchall()
+        return {
+            path: {'stats': (mtime_ns, size), 'width': width, 'height': height}
+            for path, mtime_ns, size, width, height in rows
+        }
+
+    def sync_directory(self, directory, found):
+        # Bring the files of directory in line with a scan of it (found:
+        # path -> (mtime_ns, size)). A changed file loses its hash and size.
+        # Returns True if anything changed.
+        directory = os.path.abspath(directory)
+        found = {os.path.abspath(path): stats for path, stats in found.items()}
+        known = {path: info['stats'] for path, info in self.list_files(directory).items()}
+        gone = [(path,) for path in known if path not in found]
+        changed = [
+            (path, directory, stats[1], stats[0], time.time())
+            for path, stats in found.items() if known.get(path) != stats
+        ]
+        if not gone and not changed:
+            return False
+        with self.lock, self.db:
+            self.db.executemany('DELETE FROM files WHERE path = ?', gone)
+            self.db.executemany(
+                'INSERT OR REPLACE INTO files (path, directory, size, mtime_ns, added_at) VALUES (?, ?, ?, ?, ?)',
+                changed
+            )
+        return True